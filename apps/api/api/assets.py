@@ -0,0 +1,368 @@
+"""Serving processed book assets from local storage.
+
+Responses carry strong ETags derived from the content hashes recorded in
+``manifest.json``, honor ``If-None-Match`` and single-range ``Range``
+requests, and never buffer whole files in Python. File bodies are handed
+to the server or a reverse proxy for zero-copy delivery when possible:
+
+* ``ASSET_ACCEL_REDIRECT_PREFIX`` set: an empty response with an
+  ``X-Accel-Redirect`` header lets nginx ``sendfile`` the file (and handle
+  ``Range`` itself) from an internal location mapped onto storage/books,
+  configured as in ``docker/nginx/assets.conf``.
+* ASGI servers advertising the ``http.response.zerocopysend`` extension
+  receive the open file descriptor.
+* Otherwise the requested byte range is streamed in fixed-size chunks.
+
+Chapters and stylesheets are precompressed by the worker at ingestion;
+the best ``.br`` or ``.gz`` sibling accepted by the client is served with
+a matching ``Content-Encoding``, so nothing is compressed per request.
+nginx drops the upstream ``Content-Encoding`` on an internal redirect, so
+with X-Accel-Redirect the identity file is always named and nginx picks
+the sibling itself with ``gzip_static``/``brotli_static``.
+"""
+
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from .cache import TTLCache
+from .storage import book_dir
+
+ASSET_ACCEL_REDIRECT_PREFIX = os.getenv("ASSET_ACCEL_REDIRECT_PREFIX", "")
+
+ASSET_CHUNK_SIZE = 64 * 1024
+
+# Versioned URLs (?v=<sha256>) never change and may be cached for a year
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+# Preferred first when a client accepts several encodings equally
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+for _type, _ext in (
+    ("application/xhtml+xml", ".xhtml"),
+    ("image/webp", ".webp"),
+    ("font/woff", ".woff"),
+    ("font/woff2", ".woff2"),
+    ("font/otf", ".otf"),
+    ("font/ttf", ".ttf"),
+):
+    mimetypes.add_type(_type, _ext)
+
+# Book id -> (manifest mtime, {asset path: manifest entry})
+_asset_index: TTLCache[str, Tuple[int, Dict[str, dict]]] = TTLCache(max_size=512, ttl=3600)
+
+
+@dataclass
+class Asset:
+    path: Path
+    relative_path: str  # Path relative to storage/books
+    size: int
+    media_type: str
+    etag: str
+    sha256: Optional[str]
+    encoding: Optional[str] = None  # Content-Encoding of the file served
+    negotiated: bool = False  # Whether precompressed variants exist
+
+
+def _collect_entries(node, index: Dict[str, dict]) -> None:
+    if isinstance(node, dict):
+        if isinstance(node.get("path"), str) and isinstance(node.get("sha256"), str):
+            index[node["path"]] = {"sha256": node["sha256"], "encodings": node.get("encodings") or {}}
+        for value in node.values():
+            _collect_entries(value, index)
+    elif isinstance(node, list):
+        for value in node:
+            _collect_entries(value, index)
+
+
+def _load_index(manifest_path: Path) -> Tuple[int, Dict[str, dict]]:
+    stat_result = manifest_path.stat()
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    index: Dict[str, dict] = {}
+    _collect_entries(manifest, index)
+    return stat_result.st_mtime_ns, index
+
+
+async def _asset_index_for(book_id: str) -> Dict[str, dict]:
+    manifest_path = book_dir(book_id) / "manifest.json"
+    try:
+        mtime_ns = (await anyio.to_thread.run_sync(manifest_path.stat)).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+
+    cached = _asset_index.get(book_id)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+
+    try:
+        loaded = await anyio.to_thread.run_sync(_load_index, manifest_path)
+    except (FileNotFoundError, ValueError):
+        return {}
+    _asset_index.set(book_id, loaded)
+    return loaded[1]
+
+
+def accepted_encodings(header: Optional[str]) -> List[str]:
+    """Return the precompressed encodings an ``Accept-Encoding`` header allows, best first."""
+    if not header:
+        return []
+
+    weights: Dict[str, float] = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[token] = weight
+
+    wildcard = weights.get("*", 0.0)
+    ranked = [
+        (weights.get(encoding, wildcard), -order, encoding)
+        for order, encoding in enumerate(ENCODING_SUFFIXES)
+    ]
+    return [encoding for weight, _, encoding in sorted(ranked, reverse=True) if weight > 0]
+
+
+async def resolve_asset(book_id: str, asset_path: str, accept_encoding: Optional[str] = None) -> Optional[Asset]:
+    """Locate a stored asset of a book, refusing paths outside its directory.
+
+    When the client accepts an encoding the asset was precompressed with,
+    the returned asset points at that variant instead.
+    """
+    normalized = posixpath.normpath(asset_path)
+    if normalized.startswith(("../", "/")) or normalized in ("..", "."):
+        return None
+
+    path = book_dir(book_id) / normalized
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not stat.S_ISREG(stat_result.st_mode):
+        return None
+
+    entry = (await _asset_index_for(book_id)).get(normalized) or {}
+    sha256 = entry.get("sha256")
+    if sha256 is not None:
+        etag = f'"{sha256}"'
+    else:
+        etag = f'W/"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+    media_type, _ = mimetypes.guess_type(normalized)
+    asset = Asset(
+        path=path,
+        relative_path=f"{book_id}/{normalized}",
+        size=stat_result.st_size,
+        media_type=media_type or "application/octet-stream",
+        etag=etag,
+        sha256=sha256,
+        negotiated=bool(entry.get("encodings")),
+    )
+
+    # nginx negotiates the precompressed siblings of redirected assets, so
+    # one tag covers every encoding and can only be weak
+    if ASSET_ACCEL_REDIRECT_PREFIX:
+        accept_encoding = None
+        if asset.negotiated and not etag.startswith("W/"):
+            asset.etag = f"W/{etag}"
+
+    for encoding in accepted_encodings(accept_encoding):
+        if encoding not in entry.get("encodings", {}):
+            continue
+        suffix = ENCODING_SUFFIXES[encoding]
+        try:
+            variant = await anyio.to_thread.run_sync(os.stat, path.with_name(path.name + suffix))
+        except FileNotFoundError:
+            continue
+        asset.path = path.with_name(path.name + suffix)
+        asset.relative_path += suffix
+        asset.size = variant.st_size
+        asset.etag = etag[:-1] + f'-{encoding}"'
+        asset.encoding = encoding
+        break
+
+    return asset
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    weak = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == weak:
+            return True
+    return False
+
+
+def _if_range_matches(header: str, etag: str) -> bool:
+    # If-Range needs a strong match; a weak tag may cover other bytes
+    return not etag.startswith("W/") and header.strip() == etag
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range ``Range`` header into an inclusive byte range.
+
+    Returns:
+        Optional[Tuple[int, int]]: The range, or None if the header is not a
+        single byte range (the full file should be sent)
+
+    Raises:
+        ValueError: If the range cannot be satisfied
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+
+    if size == 0:
+        raise ValueError("Range of an empty file")
+
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class AssetResponse(Response):
+    """Conditional, range-aware response for a stored asset."""
+
+    def __init__(
+        self,
+        asset: Asset,
+        request_headers,
+        immutable: bool = False,
+        background: Optional[BackgroundTask] = None,
+    ):
+        super().__init__(status_code=200, media_type=asset.media_type, background=background)
+        self.asset = asset
+        self.byte_range: Optional[Tuple[int, int]] = None
+
+        headers = {
+            "etag": asset.etag,
+            "cache-control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+            "accept-ranges": "bytes",
+        }
+        if asset.negotiated:
+            headers["vary"] = "Accept-Encoding"
+        if asset.encoding is not None:
+            headers["content-encoding"] = asset.encoding
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None and _etag_matches(if_none_match, asset.etag):
+            self.status_code = 304
+            self._set_headers(headers)
+            return
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and (if_range is None or _if_range_matches(if_range, asset.etag)):
+            try:
+                self.byte_range = parse_range(range_header, asset.size)
+            except ValueError:
+                self.status_code = 416
+                headers["content-range"] = f"bytes */{asset.size}"
+                headers["content-length"] = "0"
+                self._set_headers(headers)
+                return
+
+        if self.byte_range is not None:
+            start, end = self.byte_range
+            self.status_code = 206
+            headers["content-range"] = f"bytes {start}-{end}/{asset.size}"
+            headers["content-length"] = str(end - start + 1)
+        else:
+            headers["content-length"] = str(asset.size)
+
+        if ASSET_ACCEL_REDIRECT_PREFIX:
+            # nginx serves the body and applies Range on its own
+            self.status_code = 200
+            self.byte_range = None
+            headers.pop("content-range", None)
+            headers.pop("content-length", None)
+            headers["x-accel-redirect"] = ASSET_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + asset.relative_path
+
+        self._set_headers(headers)
+
+    def _set_headers(self, headers: Dict[str, str]) -> None:
+        for name, value in headers.items():
+            self.headers[name] = value
+        if self.status_code in (304, 416):
+            del self.headers["content-type"]
+        if self.status_code == 304:
+            del self.headers["content-length"]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        method = scope.get("method", "GET")
+        if self.status_code in (304, 416) or method == "HEAD" or ASSET_ACCEL_REDIRECT_PREFIX:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        else:
+            start, end = self.byte_range or (0, self.asset.size - 1)
+            await self._send_file(scope, send, start, end - start + 1)
+
+        if self.background is not None:
+            await self.background()
+
+    async def _send_file(self, scope: Scope, send: Send, offset: int, count: int) -> None:
+        extensions = scope.get("extensions") or {}
+
+        if "http.response.zerocopysend" in extensions:
+            with open(self.asset.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": offset,
+                    "count": count,
+                    "more_body": False,
+                })
+            return
+
+        async with await anyio.open_file(self.asset.path, mode="rb") as file:
+            await file.seek(offset)
+            remaining = count
+            while remaining > 0:
+                chunk = await file.read(min(ASSET_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; end the body rather than hang
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -1,28 +1,64 @@
 """Authentication utilities and JWT token management."""
 
+import asyncio
+import hashlib
 import os
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any, Optional
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, TypeVar
 
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy import Boolean, DateTime, String, select
+from sqlalchemy import Boolean, DateTime, delete, select, update
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.sql import func
 
+from .cache import TTLCache
 from .database import Base
 
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
 # JWT Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-super-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 15
 REFRESH_TOKEN_EXPIRE_DAYS = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context, created on first use to keep passlib off the boot path
+_pwd_context: Optional["CryptContext"] = None
+
+# bcrypt releases the GIL, so hashing runs on a dedicated thread pool instead
+# of blocking the event loop; jobs beyond the queue limit are rejected
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0")) or os.cpu_count() or 1
+PASSWORD_HASH_MAX_PENDING = int(
+    os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 16))
+)
+
+_password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+)
+_password_jobs_pending = 0
+
+# Verified token payloads, keyed by a digest of the token and kept until the
+# token expires, so the reader's repeated requests skip decoding; 0 disables
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+
+_token_cache: TTLCache[bytes, dict] = TTLCache(TOKEN_CACHE_MAX_SIZE, ttl=0)
+
+# Checks that reject a verified, unexpired token, such as
+# revocation.tokens_revoked; see add_revocation_check
+_revocation_checks: List[Callable[[dict], bool]] = []
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashing jobs are already queued."""
 
 
 class RefreshToken(Base):
@@ -31,12 +67,12 @@ class RefreshToken(Base):
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
-        index=True
+        default=uuid.uuid4
     )
     
-    token: Mapped[str] = mapped_column(
-        String(255),
+    # The token's "jti" claim; the JWT itself is never stored
+    jti: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
         unique=True,
         index=True,
         nullable=False
@@ -50,7 +86,8 @@ class RefreshToken(Base):
     
     expires_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        nullable=False
+        nullable=False,
+        index=True
     )
     
     created_at: Mapped[datetime] = mapped_column(
@@ -65,14 +102,52 @@ class RefreshToken(Base):
     )
 
 
+def get_pwd_context() -> "CryptContext":
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a plain password."""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+def password_hash_queue_depth() -> int:
+    """Number of password hashing jobs queued or running."""
+    return _password_jobs_pending
+
+
+async def _run_password_job(func: Callable[..., T], *args: Any) -> T:
+    global _password_jobs_pending
+    
+    if _password_jobs_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHasherBusy()
+    
+    _password_jobs_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_jobs_pending -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool without blocking the event loop."""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool without blocking the event loop."""
+    return await _run_password_job(get_password_hash, password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -84,7 +159,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire, "type": "access"})
+    # "iat" is kept to the millisecond so revocations split tokens exactly
+    to_encode.update({"exp": expire, "iat": round(time.time(), 3), "type": "access"})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -96,6 +172,7 @@ def create_refresh_token(data: dict) -> str:
     
     to_encode.update({
         "exp": expire,
+        "iat": round(time.time(), 3),
         "type": "refresh",
         "jti": str(uuid.uuid4())  # JWT ID for token revocation
     })
@@ -104,27 +181,47 @@ def create_refresh_token(data: dict) -> str:
     return encoded_jwt
 
 
-def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
-    """Verify and decode a JWT token."""
+def add_revocation_check(check: Callable[[dict], bool]) -> None:
+    """Reject tokens whose payload ``check`` returns True for.
+
+    Checks run on every verification, cached or not, so they must be cheap
+    and must not block; keep the revocation state they read in memory.
+    """
+    _revocation_checks.append(check)
+
+
+def _decode_token(token: str) -> Optional[dict]:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        
-        # Check token type
-        if payload.get("type") != token_type:
-            return None
-        
-        # Check expiration
-        exp = payload.get("exp")
-        if exp is None:
-            return None
-        
-        if datetime.now(timezone.utc) > datetime.fromtimestamp(exp, tz=timezone.utc):
+        # Signature and expiry are both verified by jose
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require_exp": True})
+    except JWTError:
+        return None
+
+
+def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
+    """Verify and decode a JWT token.
+
+    Only called from the event loop, like the cache it uses.
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    payload = _token_cache.get(key)
+    
+    if payload is None:
+        payload = _decode_token(token)
+        if payload is None:
             return None
         
-        return payload
+        if TOKEN_CACHE_MAX_SIZE:
+            _token_cache.set(key, payload, ttl=payload["exp"] - time.time())
     
-    except JWTError:
+    # Check token type
+    if payload.get("type") != token_type:
+        return None
+    
+    if any(check(payload) for check in _revocation_checks):
         return None
+    
+    return payload
 
 
 async def store_refresh_token(
@@ -132,13 +229,13 @@ async def store_refresh_token(
     token: str, 
     user_id: uuid.UUID
 ) -> RefreshToken:
-    """Store a refresh token in the database."""
-    # Decode token to get expiration
-    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    """Store a refresh token in the database, keyed by its jti."""
+    # The token was just issued by us, so its claims need no verification
+    payload = jwt.get_unverified_claims(token)
     expires_at = datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
     
     refresh_token_record = RefreshToken(
-        token=token,
+        jti=uuid.UUID(payload["jti"]),
         user_id=user_id,
         expires_at=expires_at
     )
@@ -150,13 +247,24 @@ async def store_refresh_token(
     return refresh_token_record
 
 
+def _token_jti(payload: dict) -> Optional[uuid.UUID]:
+    try:
+        return uuid.UUID(payload["jti"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
 async def verify_refresh_token(db: AsyncSession, token: str) -> Optional[dict]:
     payload = verify_token(token, token_type="refresh")
     if not payload:
         return None
     
+    jti = _token_jti(payload)
+    if jti is None:
+        return None
+    
     stmt = select(RefreshToken).where(
-        RefreshToken.token == token,
+        RefreshToken.jti == jti,
         RefreshToken.is_revoked == False  # noqa: E712
     )
     result = await db.execute(stmt)
@@ -173,44 +281,59 @@ async def verify_refresh_token(db: AsyncSession, token: str) -> Optional[dict]:
 
 
 async def revoke_refresh_token(db: AsyncSession, token: str) -> bool:
-    stmt = select(RefreshToken).where(RefreshToken.token == token)
-    result = await db.execute(stmt)
-    token_record = result.scalar_one_or_none()
+    try:
+        # Expired tokens can still be revoked
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+    except JWTError:
+        return False
     
-    if token_record:
-        token_record.is_revoked = True
-        await db.commit()
-        return True
+    jti = _token_jti(payload)
+    if jti is None:
+        return False
     
-    return False
+    return await revoke_refresh_token_jti(db, jti)
+
+
+async def revoke_refresh_token_jti(db: AsyncSession, jti: uuid.UUID) -> bool:
+    stmt = update(RefreshToken).where(RefreshToken.jti == jti).values(is_revoked=True)
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount > 0
 
 
 async def revoke_all_user_tokens(db: AsyncSession, user_id: uuid.UUID) -> int:
-    stmt = select(RefreshToken).where(
-        RefreshToken.user_id == user_id,
-        RefreshToken.is_revoked == False  # noqa: E712
+    stmt = (
+        update(RefreshToken)
+        .where(
+            RefreshToken.user_id == user_id,
+            RefreshToken.is_revoked == False  # noqa: E712
+        )
+        .values(is_revoked=True)
     )
     result = await db.execute(stmt)
-    tokens = result.scalars().all()
-    
-    count = 0
-    for token in tokens:
-        token.is_revoked = True
-        count += 1
-    
     await db.commit()
-    return count
+    return result.rowcount
 
 
-async def cleanup_expired_tokens(db: AsyncSession) -> int:
+async def cleanup_expired_tokens(db: AsyncSession, batch_size: int = 10_000) -> int:
+    """Delete expired refresh tokens in batches, committing after each one.
+
+    Batches lock rows with SKIP LOCKED, so concurrent purges never wait on
+    each other and no transaction holds more than ``batch_size`` row locks.
+    """
     now = datetime.now(timezone.utc)
-    stmt = select(RefreshToken).where(RefreshToken.expires_at < now)
-    result = await db.execute(stmt)
-    expired_tokens = result.scalars().all()
+    total = 0
     
-    count = len(expired_tokens)
-    for token in expired_tokens:
-        await db.delete(token)
-    
-    await db.commit()
-    return count
+    while True:
+        expired = (
+            select(RefreshToken.id)
+            .where(RefreshToken.expires_at < now)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        result = await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(expired)))
+        await db.commit()
+        
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
@@ -0,0 +1,134 @@
+"""In-process caches for authentication hot paths.
+
+Authenticated users are cached per API process for a short TTL, so most
+requests skip the ``users`` lookup in ``get_current_user``. Changes that
+must take effect immediately (deactivation, password changes, logging out
+everywhere) call :func:`invalidate_user`, which evicts the entry locally
+and broadcasts the eviction to every other API process over Redis.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+from redis.exceptions import RedisError
+
+from .redis_client import get_redis
+from .schemas import UserResponse
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+USER_INVALIDATION_CHANNEL = "pixel_pages:users:invalidate"
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """A bounded LRU mapping whose entries also expire after a TTL.
+
+    Not thread-safe; it is only used from the event loop.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[K, tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+user_cache: TTLCache[uuid.UUID, UserResponse] = TTLCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+
+# Without a live subscription this process would miss invalidations
+_subscribed = False
+
+
+def get_cached_user(user_id: uuid.UUID) -> Optional[UserResponse]:
+    """Return a cached active user, if invalidations are being received."""
+    if not _subscribed:
+        return None
+    return user_cache.get(user_id)
+
+
+def cache_user(user: UserResponse) -> None:
+    if _subscribed:
+        user_cache.set(user.id, user)
+
+
+async def invalidate_user(user_id: uuid.UUID) -> None:
+    """Evict a user from the cache of every API process."""
+    user_cache.pop(user_id)
+
+    try:
+        await get_redis().publish(USER_INVALIDATION_CHANNEL, str(user_id))
+    except RedisError:
+        # Other processes fall back to the TTL
+        logger.warning("Could not broadcast invalidation of user %s", user_id, exc_info=True)
+
+
+async def listen_for_user_invalidations() -> None:
+    """Apply invalidations broadcast by other API processes until cancelled."""
+    global _subscribed
+    backoff = 1.0
+
+    while True:
+        try:
+            async with get_redis().pubsub() as pubsub:
+                await pubsub.subscribe(USER_INVALIDATION_CHANNEL)
+                # Anything may have changed while we were not subscribed
+                user_cache.clear()
+                _subscribed = True
+                backoff = 1.0
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    try:
+                        user_cache.pop(uuid.UUID(message["data"]))
+                    except ValueError:
+                        continue
+
+        except (RedisError, OSError):
+            logger.warning("User invalidation listener disconnected, retrying in %.0fs", backoff)
+        finally:
+            _subscribed = False
+            user_cache.clear()
+
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
@@ -0,0 +1,117 @@
+"""Celery client used to enqueue worker tasks.
+
+The API never imports worker code; tasks are sent by name. Celery is only
+imported when the first task is sent, keeping it off the boot path.
+
+Ingestion is routed by file size so a large EPUB cannot hold up the small
+ones queued behind it: ``ingest.small`` is served by its own worker slots,
+while ``ingest.large`` and ``ingest.bulk`` (imports of many books at once)
+share slow lanes, large first. Queues and limits must match
+``worker.main``.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    from celery import Celery
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Files from this size on are ingested on the large queue
+INGEST_LARGE_MIN_BYTES = int(os.getenv("INGEST_LARGE_MIN_BYTES", str(8 * 1024 * 1024)))
+
+# Redis emulates priorities with one list per step; 0 is served first
+BROKER_TRANSPORT_OPTIONS = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+
+
+@dataclass(frozen=True)
+class IngestQueue:
+    """A queue of ``process_epub`` tasks and the time limits of its tasks.
+
+    The worker runs on the threads pool, where Celery enforces neither
+    limit: it checks the soft limit between ingestion steps and bounds its
+    waits on pooled normalize and image work by the hard limit.
+    """
+
+    name: str
+    soft_time_limit: int
+    time_limit: int
+
+
+INGEST_SMALL = IngestQueue(
+    "ingest.small",
+    soft_time_limit=int(os.getenv("INGEST_SMALL_SOFT_TIME_LIMIT", "120")),
+    time_limit=int(os.getenv("INGEST_SMALL_TIME_LIMIT", "180")),
+)
+INGEST_LARGE = IngestQueue(
+    "ingest.large",
+    soft_time_limit=int(os.getenv("INGEST_LARGE_SOFT_TIME_LIMIT", "900")),
+    time_limit=int(os.getenv("INGEST_LARGE_TIME_LIMIT", "1200")),
+)
+INGEST_BULK = IngestQueue(
+    "ingest.bulk",
+    soft_time_limit=int(os.getenv("INGEST_BULK_SOFT_TIME_LIMIT", "900")),
+    time_limit=int(os.getenv("INGEST_BULK_TIME_LIMIT", "1200")),
+)
+
+INGEST_QUEUES = (INGEST_SMALL, INGEST_LARGE, INGEST_BULK)
+
+
+def broker_queue_keys(queue: str) -> List[str]:
+    """Redis lists holding a queue's messages, one per priority step."""
+    sep = BROKER_TRANSPORT_OPTIONS["sep"]
+    return [queue if step == 0 else f"{queue}{sep}{step}" for step in BROKER_TRANSPORT_OPTIONS["priority_steps"]]
+
+
+def ingest_route(file_size: int, bulk: bool = False) -> dict:
+    """Queue, priority and time limits for ingesting a file of this size.
+
+    Within a queue, smaller files get a higher priority (a lower step),
+    one step per doubling from 256 KiB on, so short books overtake longer
+    ones waiting on the same queue.
+    """
+    if bulk:
+        queue = INGEST_BULK
+    elif file_size >= INGEST_LARGE_MIN_BYTES:
+        queue = INGEST_LARGE
+    else:
+        queue = INGEST_SMALL
+
+    return {
+        "queue": queue.name,
+        "priority": min(9, (file_size // (256 * 1024)).bit_length()),
+        "soft_time_limit": queue.soft_time_limit,
+        "time_limit": queue.time_limit,
+    }
+
+
+_celery_app: Optional["Celery"] = None
+
+
+def get_celery_app() -> "Celery":
+    """Return the process-wide Celery client, creating it on first use."""
+    global _celery_app
+    if _celery_app is None:
+        from celery import Celery
+
+        app = Celery(
+            "pixel_pages_api",
+            broker=REDIS_URL,
+            backend=REDIS_URL,
+        )
+        app.conf.update(
+            task_serializer="json",
+            accept_content=["json"],
+            result_serializer="json",
+            timezone="UTC",
+            enable_utc=True,
+            broker_transport_options=BROKER_TRANSPORT_OPTIONS,
+        )
+        _celery_app = app
+    return _celery_app
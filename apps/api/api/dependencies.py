@@ -7,42 +7,44 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .auth import verify_refresh_token, verify_token
-from .database import get_database_session
+from .cache import cache_user, get_cached_user
+from .database import async_session, get_database_session
 from .models import User
 from .schemas import UserResponse
 
 security = HTTPBearer()
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: AsyncSession = Depends(get_database_session)
-) -> UserResponse:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+def _token_user_id(credentials: HTTPAuthorizationCredentials) -> uuid.UUID:
     payload = verify_token(credentials.credentials, token_type="access")
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     user_id = payload.get("sub")
     if user_id is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     try:
-        user_uuid = uuid.UUID(user_id)
+        return uuid.UUID(user_id)
     except ValueError:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+
+
+async def _load_user(db: AsyncSession, user_uuid: uuid.UUID) -> UserResponse:
     stmt = select(User).where(User.id == user_uuid)
     result = await db.execute(stmt)
     user = result.scalar_one_or_none()
     
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     if not user.is_active:
         raise HTTPException(
@@ -50,7 +52,43 @@ async def get_current_user(
             detail="Inactive user"
         )
     
-    return UserResponse.model_validate(user)
+    user_response = UserResponse.model_validate(user)
+    cache_user(user_response)
+    return user_response
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_database_session)
+) -> UserResponse:
+    user_uuid = _token_user_id(credentials)
+    
+    # Only active users are cached, so a hit needs no further checks
+    cached_user = get_cached_user(user_uuid)
+    if cached_user is not None:
+        return cached_user
+    
+    return await _load_user(db, user_uuid)
+
+
+async def get_current_user_unpooled(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> UserResponse:
+    """Like get_current_user, for routes that stream a request or response body.
+
+    The request-scoped session of ``get_database_session`` is only closed
+    once the response has been sent, so it would hold a pooled connection
+    for the whole upload or event stream. This looks the user up in a
+    session of its own that is closed before the route runs.
+    """
+    user_uuid = _token_user_id(credentials)
+    
+    cached_user = get_cached_user(user_uuid)
+    if cached_user is not None:
+        return cached_user
+    
+    async with async_session() as db:
+        return await _load_user(db, user_uuid)
 
 
 async def get_current_active_user(
@@ -0,0 +1,147 @@
+"""Readiness probes of the API's dependencies.
+
+Readiness checks Postgres through the application's own engine pool (so an
+exhausted pool makes the instance unready, which is what a load balancer
+needs to know), Redis and the Celery broker, reporting the backlog of every
+queue the API sends tasks to. Probes run concurrently with a
+short timeout each, and their result is shared for ``HEALTH_CACHE_SECONDS``:
+frequent load balancer probes cost one round of checks per interval, and
+concurrent probes wait for the round in flight instead of starting another.
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from redis.asyncio import Redis
+from sqlalchemy import text
+
+from . import celery_app
+from .database import engine, get_pool_stats
+from .redis_client import REDIS_URL, get_redis
+
+# Seconds a readiness result is reused before dependencies are probed again
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "2"))
+
+# Seconds each dependency gets to answer, including the wait for a pooled
+# connection
+HEALTH_PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "2"))
+
+# Queues the API sends tasks to, whose backlogs are reported with the broker
+BACKLOG_QUEUES = ("celery",) + tuple(queue.name for queue in celery_app.INGEST_QUEUES)
+
+_broker: Optional[Redis] = None
+
+
+def _get_broker() -> Redis:
+    global _broker
+    if celery_app.REDIS_URL == REDIS_URL:
+        return get_redis()
+    if _broker is None:
+        _broker = Redis.from_url(celery_app.REDIS_URL, decode_responses=True)
+    return _broker
+
+
+async def close_broker() -> None:
+    global _broker
+    if _broker is not None:
+        await _broker.aclose()
+        _broker = None
+
+
+async def _probe_database() -> dict:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+    return {}
+
+
+async def _probe_redis() -> dict:
+    await get_redis().ping()
+    return {}
+
+
+async def _probe_broker() -> dict:
+    # Each priority step of a queue is a list of its own
+    keys = {queue: celery_app.broker_queue_keys(queue) for queue in BACKLOG_QUEUES}
+    async with _get_broker().pipeline(transaction=False) as pipe:
+        for queue_keys in keys.values():
+            for key in queue_keys:
+                pipe.llen(key)
+        lengths = iter(await pipe.execute())
+
+    backlog = {queue: sum(next(lengths) for _ in queue_keys) for queue, queue_keys in keys.items()}
+    return {"queue_length": sum(backlog.values()), "queues": backlog}
+
+
+PROBES: Dict[str, Callable[[], Awaitable[dict]]] = {
+    "database": _probe_database,
+    "redis": _probe_redis,
+    "broker": _probe_broker,
+}
+
+
+async def _run_probe(probe: Callable[[], Awaitable[dict]]) -> dict:
+    started = time.perf_counter()
+    try:
+        details = await asyncio.wait_for(probe(), HEALTH_PROBE_TIMEOUT)
+        result = {"ok": True, **details}
+    except asyncio.TimeoutError:
+        result = {"ok": False, "error": f"timed out after {HEALTH_PROBE_TIMEOUT}s"}
+    except Exception as exc:
+        result = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+async def _check() -> dict:
+    results = await asyncio.gather(*(_run_probe(probe) for probe in PROBES.values()))
+    dependencies = dict(zip(PROBES, results))
+    pool = get_pool_stats()
+    return {
+        "status": "ready" if all(result["ok"] for result in results) else "unavailable",
+        "checked_at": time.time(),
+        "dependencies": dependencies,
+        "pool": {
+            "saturation": pool["saturation"],
+            "checked_out": pool["checked_out"],
+            "overflow": pool["overflow"],
+            "timeouts": pool["timeouts"],
+            "wait_seconds_max": pool["wait_seconds_max"],
+        },
+    }
+
+
+class ReadinessCache:
+    """Shares one readiness result per interval between all probes."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._result: Optional[dict] = None
+        self._expires_at = 0.0
+        self._pending: Optional[asyncio.Task] = None
+
+    async def get(self) -> dict:
+        if self._result is not None and time.monotonic() < self._expires_at:
+            return {**self._result, "cached": True}
+
+        if self._pending is None:
+            self._pending = asyncio.create_task(_check())
+            self._pending.add_done_callback(self._store)
+        # Shielded so a probe disconnecting does not cancel the shared check
+        result = await asyncio.shield(self._pending)
+        return {**result, "cached": False}
+
+    def _store(self, task: asyncio.Task) -> None:
+        self._pending = None
+        if not task.cancelled() and task.exception() is None:
+            self._result = task.result()
+            self._expires_at = time.monotonic() + self.ttl
+
+
+readiness = ReadinessCache(HEALTH_CACHE_SECONDS)
+
+
+async def check_readiness() -> dict:
+    """Readiness of this instance and its dependencies, cached briefly."""
+    return await readiness.get()
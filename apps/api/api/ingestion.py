@@ -0,0 +1,86 @@
+"""EPUB ingestion: hashing uploads and handing them to the worker."""
+
+import asyncio
+import hashlib
+import time
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .celery_app import get_celery_app, ingest_route
+from .models import Book
+from .search import copy_search_documents
+from .storage import book_dir, link_book_assets, resolve_storage_path
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Metadata copied from an already processed copy of the same file
+DUPLICATE_FIELDS = ("title", "author", "description", "isbn", "language")
+
+
+def hash_file(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file, read in fixed-size chunks."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+async def find_processed_book(db: AsyncSession, content_hash: str) -> Optional[Book]:
+    """Return any processed book ingested from a file with this hash."""
+    stmt = (
+        select(Book)
+        .where(Book.content_hash == content_hash, Book.processed == True)  # noqa: E712
+        .limit(1)
+    )
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def start_ingestion(db: AsyncSession, book: Book, bulk: bool = False) -> Optional[str]:
+    """Process an uploaded book, reusing the assets of an identical upload.
+
+    When a processed book was ingested from a byte-identical EPUB, its
+    assets are linked into the new book's directory and the book is
+    completed right away without enqueuing any work. Otherwise the book is
+    queued by size (see ``ingest_route``); ``bulk`` sends it to the bulk
+    import queue instead.
+
+    Returns:
+        Optional[str]: Celery task id, or None if the book was completed
+        from an existing copy
+    """
+    if book.content_hash is None:
+        book.content_hash = await asyncio.to_thread(hash_file, resolve_storage_path(book.file_path))
+
+    duplicate = await find_processed_book(db, book.content_hash)
+
+    if duplicate is not None and duplicate.id != book.id and book_dir(duplicate.id).is_dir():
+        await asyncio.to_thread(link_book_assets, duplicate.id, book.id)
+
+        for field in DUPLICATE_FIELDS:
+            setattr(book, field, getattr(duplicate, field))
+        if duplicate.cover_image_path:
+            book.cover_image_path = duplicate.cover_image_path.replace(str(duplicate.id), str(book.id))
+        book.processed = True
+        await db.flush()
+        await copy_search_documents(db, duplicate.id, book.id, book.owner_id)
+        await db.commit()
+
+        resolve_storage_path(book.file_path).unlink(missing_ok=True)
+        return None
+
+    await db.commit()
+
+    result = await asyncio.to_thread(
+        get_celery_app().send_task,
+        "process_epub",
+        args=[book.file_path, str(book.id), str(book.owner_id)],
+        # The worker measures queue wait and time to readable from here
+        headers={"enqueued_at": time.time()},
+        **ingest_route(book.file_size or 0, bulk),
+    )
+    return result.id
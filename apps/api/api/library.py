@@ -0,0 +1,45 @@
+"""Book ownership checks shared by the library routes."""
+
+import uuid
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TTLCache
+from .models import Book
+
+# Book ownership never changes, so the owner lookup is cached per process
+book_owners: TTLCache[uuid.UUID, uuid.UUID] = TTLCache(max_size=10000, ttl=300)
+
+
+async def get_book_owner(db: AsyncSession, book_id: uuid.UUID) -> Optional[uuid.UUID]:
+    """Return the owner of a book, or None if it does not exist."""
+    owner_id = book_owners.get(book_id)
+    if owner_id is None:
+        result = await db.execute(select(Book.owner_id).where(Book.id == book_id))
+        owner_id = result.scalar_one_or_none()
+        if owner_id is not None:
+            book_owners.set(book_id, owner_id)
+    return owner_id
+
+
+async def owned_book_ids(db: AsyncSession, user_id: uuid.UUID, book_ids: Iterable[uuid.UUID]) -> Set[uuid.UUID]:
+    """Return which of the given books belong to a user, in at most one query."""
+    owned = set()
+    unknown = []
+    for book_id in set(book_ids):
+        owner_id = book_owners.get(book_id)
+        if owner_id is None:
+            unknown.append(book_id)
+        elif owner_id == user_id:
+            owned.add(book_id)
+
+    if unknown:
+        result = await db.execute(select(Book.id, Book.owner_id).where(Book.id.in_(unknown)))
+        for book_id, owner_id in result.all():
+            book_owners.set(book_id, owner_id)
+            if owner_id == user_id:
+                owned.add(book_id)
+
+    return owned
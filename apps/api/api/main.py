@@ -2,20 +2,46 @@
 Pixel Pages FastAPI Application
 """
 
+import asyncio
+import contextlib
 import os
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-
-from .database import create_tables
+from fastapi.responses import JSONResponse, Response
+
+from .auth import PasswordHasherBusy
+from .cache import listen_for_user_invalidations
+from .database import check_schema_version, get_pool_stats
+from .health import check_readiness, close_broker
+from .metrics import MetricsMiddleware, render_metrics
+from .progress import listen_for_progress, progress_stats
+from .redis_client import close_redis
+from .revocation import listen_for_token_revocations
 from .routes.auth import router as auth_router
+from .routes.books import router as books_router
+from .routes.reading_progress import router as reading_progress_router
+from .routes.search import router as search_router
+from .routes.uploads import router as uploads_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await create_tables()
+    await check_schema_version()
+    listeners = [
+        asyncio.create_task(listen_for_user_invalidations()),
+        asyncio.create_task(listen_for_token_revocations()),
+        asyncio.create_task(listen_for_progress()),
+    ]
     yield
+    for listener in listeners:
+        listener.cancel()
+    for listener in listeners:
+        with contextlib.suppress(asyncio.CancelledError):
+            await listener
+    await close_broker()
+    await close_redis()
 
 
 app = FastAPI(
@@ -35,7 +61,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it is outermost and times the whole middleware stack
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth_router)
+app.include_router(books_router)
+app.include_router(reading_progress_router)
+app.include_router(search_router)
+app.include_router(uploads_router)
+
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many authentication requests, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.get("/")
@@ -43,9 +85,39 @@ async def root():
     return {"message": "Pixel Pages API is running"}
 
 
+@app.get("/health/live")
+async def liveness():
+    # The event loop answering is all liveness means; dependencies are
+    # readiness concerns and must not get the process restarted
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
 @app.get("/health")
-async def health_check():
-    return {"status": "healthy", "database": "connected"}
+async def readiness():
+    result = await check_readiness()
+    status_code = status.HTTP_200_OK if result["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(
+        status_code=status_code,
+        content=result,
+        headers={"Cache-Control": "no-store"},
+    )
+
+
+@app.get("/health/pool")
+async def pool_stats():
+    return get_pool_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/health/progress")
+async def progress_relay_stats():
+    return progress_stats.snapshot()
 
 
 if __name__ == "__main__":
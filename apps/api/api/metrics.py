@@ -0,0 +1,148 @@
+"""Prometheus metrics of the API process, served on ``/metrics``.
+
+Requests are timed by a pure ASGI middleware (no per-request task or
+``BaseHTTPMiddleware`` wrapping) and labelled with the route template, not
+the raw path, so series stay bounded. Values that already live in the
+process (pool occupancy, the password hashing queue, the progress relay)
+are read only when scraped, by a custom collector.
+
+Each uvicorn worker keeps its own metrics; set ``PROMETHEUS_MULTIPROC_DIR``
+to aggregate the request and pool histograms across workers.
+"""
+
+import os
+import time
+from typing import Dict, Iterator, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from .auth import PASSWORD_HASH_MAX_PENDING, password_hash_queue_depth
+from .database import get_pool_stats, pool_stats
+from .progress import progress_stats
+
+# Request latencies span cached JSON responses to bcrypt-bound logins
+LATENCY_BUCKETS = (0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_DURATION = Histogram(
+    "pixel_pages_http_request_duration_seconds",
+    "Time to complete HTTP requests, by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "pixel_pages_http_requests_in_flight",
+    "HTTP requests being served",
+    multiprocess_mode="livesum",
+)
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "pixel_pages_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 30),
+)
+
+pool_stats.add_listener(POOL_CHECKOUT_WAIT.observe)
+
+
+class ProcessStateCollector:
+    """Reads pool, password hashing and progress relay state at scrape time."""
+
+    def collect(self) -> Iterator:
+        pool = get_pool_stats()
+        yield GaugeMetricFamily(
+            "pixel_pages_db_pool_checked_out", "Database connections in use", value=pool["checked_out"]
+        )
+        yield GaugeMetricFamily(
+            "pixel_pages_db_pool_overflow", "Connections open beyond pool_size", value=pool["overflow"]
+        )
+        yield GaugeMetricFamily(
+            "pixel_pages_db_pool_saturation", "Share of pool capacity in use", value=pool["saturation"]
+        )
+        yield CounterMetricFamily(
+            "pixel_pages_db_pool_timeouts", "Checkouts that gave up waiting", value=pool["timeouts"]
+        )
+
+        yield GaugeMetricFamily(
+            "pixel_pages_password_hash_queue_depth",
+            "Password hashing jobs queued or running",
+            value=password_hash_queue_depth(),
+        )
+        yield GaugeMetricFamily(
+            "pixel_pages_password_hash_queue_limit",
+            "Password hashing jobs accepted before requests are rejected",
+            value=PASSWORD_HASH_MAX_PENDING,
+        )
+
+        progress = progress_stats.snapshot()
+        yield GaugeMetricFamily(
+            "pixel_pages_progress_subscribers", "Open ingestion progress streams", value=progress["subscribers"]
+        )
+        yield CounterMetricFamily(
+            "pixel_pages_progress_events_relayed", "Progress events relayed", value=progress["events_relayed"]
+        )
+        yield CounterMetricFamily(
+            "pixel_pages_progress_events_dropped",
+            "Progress events dropped for slow clients",
+            value=progress["events_dropped"],
+        )
+
+
+REGISTRY.register(ProcessStateCollector())
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and counts the ones in flight."""
+
+    def __init__(self, app):
+        self.app = app
+        # Labelled children are cached; resolving labels costs more than observing
+        self._children: Dict[Tuple[str, str, str], Histogram] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_FLIGHT.dec()
+
+            # Set by the router once a route matched
+            route = scope.get("route")
+            key = (scope["method"], route.path if route is not None else "unmatched", status)
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = REQUEST_DURATION.labels(*key)
+            child.observe(elapsed)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Body and content type of a scrape."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        registry.register(ProcessStateCollector())
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
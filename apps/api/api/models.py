@@ -4,10 +4,10 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, String, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Boolean, DateTime, Float, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 
 from .database import Base
 
@@ -67,6 +67,17 @@ class User(Base):
 
 class Book(Base):
     __tablename__ = "books"
+    __table_args__ = (
+        # Library listing: keyset pagination per owner, newest first, served
+        # from the index alone thanks to the included summary columns
+        Index(
+            "ix_books_owner_id_created_at_id",
+            "owner_id",
+            text("created_at DESC"),
+            text("id DESC"),
+            postgresql_include=["title", "author", "cover_image_path", "processed"],
+        ),
+    )
     
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -102,6 +113,7 @@ class Book(Base):
         nullable=True
     )
     
+    # Uploaded EPUB, relative to STORAGE_PATH (see storage.to_storage_path)
     file_path: Mapped[str] = mapped_column(
         String(500),
         nullable=False
@@ -111,6 +123,13 @@ class Book(Base):
         nullable=False
     )
     
+    # SHA-256 of the uploaded EPUB, used to skip ingesting identical files
+    content_hash: Mapped[Optional[str]] = mapped_column(
+        String(64),
+        nullable=True,
+        index=True
+    )
+    
     cover_image_path: Mapped[Optional[str]] = mapped_column(
         String(500),
         nullable=True
@@ -124,8 +143,7 @@ class Book(Base):
     
     owner_id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
-        nullable=False,
-        index=True
+        nullable=False
     )
     
     created_at: Mapped[datetime] = mapped_column(
@@ -140,3 +158,112 @@ class Book(Base):
         onupdate=func.now(),
         nullable=False
     )
+
+
+class ReadingProgress(Base):
+    """Last reading position of a user in a book.
+
+    Written in batches by the worker from the Redis buffer filled by the
+    API (see :mod:`api.reading_progress`), never per request.
+    """
+    __tablename__ = "reading_progress"
+    
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        primary_key=True
+    )
+    
+    book_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("books.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    
+    cfi: Mapped[str] = mapped_column(
+        Text,
+        nullable=False
+    )
+    
+    percent: Mapped[float] = mapped_column(
+        Float,
+        nullable=False
+    )
+    
+    # When the reader recorded the position; the newest one wins
+    client_updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False
+    )
+    
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+
+
+class BookSearchDocument(Base):
+    """Weighted full-text document of a book's metadata, written by the worker."""
+    __tablename__ = "book_search_documents"
+    __table_args__ = (
+        # btree_gin lets the owner filter and the text match share one index
+        Index("ix_book_search_documents_owner_id_document", "owner_id", "document", postgresql_using="gin"),
+    )
+    
+    book_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("books.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    
+    owner_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        nullable=False
+    )
+    
+    # title (A), author (B), description (C)
+    document: Mapped[str] = mapped_column(
+        TSVECTOR,
+        nullable=False
+    )
+
+
+class ChapterSearchDocument(Base):
+    """Plain text and full-text document of one spine chapter, written by the worker."""
+    __tablename__ = "chapter_search_documents"
+    __table_args__ = (
+        Index("ix_chapter_search_documents_owner_id_document", "owner_id", "document", postgresql_using="gin"),
+    )
+    
+    book_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("books.id", ondelete="CASCADE"),
+        primary_key=True
+    )
+    
+    chapter_index: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True
+    )
+    
+    owner_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        nullable=False
+    )
+    
+    path: Mapped[str] = mapped_column(
+        String(500),
+        nullable=False
+    )
+    
+    # Kept for ts_headline snippets
+    content: Mapped[str] = mapped_column(
+        Text,
+        nullable=False
+    )
+    
+    # Chapter text (D)
+    document: Mapped[str] = mapped_column(
+        TSVECTOR,
+        nullable=False
+    )
@@ -0,0 +1,127 @@
+"""Relaying ingestion progress from the worker to browsers.
+
+The worker publishes progress events of each book on
+``pixel_pages:books:{book_id}:progress`` (see ``worker.progress``). Every API
+process holds a single pattern subscription to all of those channels and
+fans events out to the in-process queues of the clients watching a book, so
+the number of Redis connections does not grow with the number of open
+event streams.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+from redis.exceptions import RedisError
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_CHANNEL_PATTERN = "pixel_pages:books:*:progress"
+
+# Events buffered per client; a slow client loses the oldest ones
+SUBSCRIBER_QUEUE_SIZE = 64
+
+# Stages after which no further events follow
+FINAL_STAGES = {"done", "failed"}
+
+
+def progress_channel(book_id) -> str:
+    return f"pixel_pages:books:{book_id}:progress"
+
+
+class ProgressStats:
+    """Counts relayed events and their publish-to-relay latency."""
+
+    def __init__(self):
+        self.events = 0
+        self.dropped = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def record(self, latency: float) -> None:
+        self.events += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def snapshot(self) -> dict:
+        return {
+            "subscribers": sum(len(queues) for queues in _subscribers.values()),
+            "events_relayed": self.events,
+            "events_dropped": self.dropped,
+            "latency_avg_ms": round(self.latency_total / self.events * 1000, 2) if self.events else 0.0,
+            "latency_max_ms": round(self.latency_max * 1000, 2),
+        }
+
+
+progress_stats = ProgressStats()
+
+# Book id -> queues of the clients watching it
+_subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+
+def _deliver(book_id: str, event: dict) -> None:
+    for queue in _subscribers.get(book_id, ()):
+        if queue.full():
+            queue.get_nowait()
+            progress_stats.dropped += 1
+        queue.put_nowait(event)
+
+
+@asynccontextmanager
+async def watch_progress(book_id) -> AsyncIterator[asyncio.Queue]:
+    """Receive the progress events of a book while the context is open."""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    _subscribers.setdefault(str(book_id), set()).add(queue)
+    try:
+        yield queue
+    finally:
+        queues = _subscribers.get(str(book_id))
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del _subscribers[str(book_id)]
+
+
+async def last_progress(book_id) -> Optional[dict]:
+    """Return the most recent progress event of a book, if still stored."""
+    try:
+        event = await get_redis().get(progress_channel(book_id) + ":last")
+    except RedisError:
+        logger.warning("Could not read progress of book %s", book_id, exc_info=True)
+        return None
+    return json.loads(event) if event else None
+
+
+async def listen_for_progress() -> None:
+    """Fan out progress events published by workers until cancelled."""
+    backoff = 1.0
+
+    while True:
+        try:
+            async with get_redis().pubsub() as pubsub:
+                await pubsub.psubscribe(PROGRESS_CHANNEL_PATTERN)
+                backoff = 1.0
+
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    try:
+                        event = json.loads(message["data"])
+                        book_id = message["channel"].split(":")[2]
+                    except (ValueError, IndexError):
+                        continue
+
+                    if "published_at" in event:
+                        progress_stats.record(max(time.time() - event["published_at"], 0.0))
+                    _deliver(book_id, event)
+
+        except (RedisError, OSError):
+            logger.warning("Progress listener disconnected, retrying in %.0fs", backoff)
+
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
@@ -0,0 +1,123 @@
+"""Write-behind buffer for reading positions.
+
+Readers report their position every few seconds, so progress updates are
+not written to Postgres per request. They are coalesced in a Redis hash,
+keyed by user and book, where a Lua script keeps only the newest position
+(last write wins on the reader's timestamp). The worker's
+``flush_reading_progress`` task periodically swaps the hash out and upserts
+it with one ``INSERT ... ON CONFLICT`` per batch, so database writes scale
+with the number of distinct books read per flush window rather than with
+request volume.
+"""
+
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import ReadingProgress
+from .redis_client import get_redis
+from .schemas import ReadingProgressResponse, ReadingProgressUpdate
+
+# Must match the keys used by the worker's flush task
+PENDING_KEY = "pixel_pages:reading_progress:pending"
+FLUSHING_KEY = "pixel_pages:reading_progress:flushing"
+
+# Sets each field only if its timestamp is newer than the buffered one.
+# ARGV holds (field, timestamp, value) triples; returns the fields applied.
+COALESCE_SCRIPT = """
+local applied = 0
+for i = 1, #ARGV, 3 do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if not current or tonumber(string.match(current, '^[^\\t]+')) < tonumber(ARGV[i + 1]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+        applied = applied + 1
+    end
+end
+return applied
+"""
+
+_coalesce = None
+
+
+def _field(user_id: uuid.UUID, book_id: uuid.UUID) -> str:
+    return f"{user_id}:{book_id}"
+
+
+def _encode(update: ReadingProgressUpdate, ts: float) -> str:
+    return f"{ts:.6f}\t{update.percent}\t{update.cfi}"
+
+
+def _decode(book_id: uuid.UUID, value: str) -> ReadingProgressResponse:
+    ts, percent, cfi = value.split("\t", 2)
+    return ReadingProgressResponse(
+        book_id=book_id,
+        cfi=cfi,
+        percent=float(percent),
+        ts=datetime.fromtimestamp(float(ts), timezone.utc),
+    )
+
+
+def _unavailable() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Reading progress is temporarily unavailable",
+        headers={"Retry-After": "5"},
+    )
+
+
+async def buffer_progress(user_id: uuid.UUID, updates: List[ReadingProgressUpdate]) -> int:
+    """Coalesce progress updates into the Redis buffer.
+
+    Timestamps from the future are clamped to now, so a device with a fast
+    clock cannot shadow later positions from other devices.
+
+    Returns:
+        int: Number of updates that replaced an older buffered position
+    """
+    global _coalesce
+    now = datetime.now(timezone.utc).timestamp()
+
+    args = []
+    for update in updates:
+        ts = min(update.ts.timestamp(), now)
+        args.extend((_field(user_id, update.book_id), f"{ts:.6f}", _encode(update, ts)))
+
+    try:
+        if _coalesce is None:
+            _coalesce = get_redis().register_script(COALESCE_SCRIPT)
+        return await _coalesce(keys=[PENDING_KEY], args=args)
+    except RedisError:
+        raise _unavailable()
+
+
+async def get_progress(db: AsyncSession, user_id: uuid.UUID, book_id: uuid.UUID) -> Optional[ReadingProgressResponse]:
+    """Return the newest known position, buffered or stored."""
+    field = _field(user_id, book_id)
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hget(PENDING_KEY, field)
+            pipe.hget(FLUSHING_KEY, field)
+            buffered = await pipe.execute()
+    except RedisError:
+        raise _unavailable()
+
+    candidates = [_decode(book_id, value) for value in buffered if value]
+
+    result = await db.execute(
+        select(ReadingProgress).where(ReadingProgress.user_id == user_id, ReadingProgress.book_id == book_id)
+    )
+    stored = result.scalar_one_or_none()
+    if stored is not None:
+        candidates.append(ReadingProgressResponse(
+            book_id=book_id,
+            cfi=stored.cfi,
+            percent=stored.percent,
+            ts=stored.client_updated_at,
+        ))
+
+    return max(candidates, key=lambda progress: progress.ts, default=None)
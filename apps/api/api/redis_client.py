@@ -0,0 +1,25 @@
+"""Shared Redis connection for the API process."""
+
+import os
+from typing import Optional
+
+from redis.asyncio import Redis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_redis: Optional[Redis] = None
+
+
+def get_redis() -> Redis:
+    """Return the process-wide Redis client, creating it on first use."""
+    global _redis
+    if _redis is None:
+        _redis = Redis.from_url(REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def close_redis() -> None:
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
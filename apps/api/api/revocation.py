@@ -0,0 +1,130 @@
+"""Revocation of every token a user holds.
+
+Logging out everywhere and changing the password call
+:func:`revoke_user_tokens`, which records a per-user "not before" time.
+Tokens issued (``iat``) before it are rejected by ``verify_token``, cached
+or not. The check reads process memory only: revocations are broadcast to
+every API process over Redis, and kept in a Redis hash that a process
+reloads whenever it (re)subscribes, so it also learns of the ones it
+missed while disconnected. Entries are only needed for as long as a token
+issued before them can live, so they expire after the access token
+lifetime. They are never evicted before that, however many there are: a
+revocation dropped early would let the user's tokens back in.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+
+from .auth import ACCESS_TOKEN_EXPIRE_MINUTES, add_revocation_check
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REVOCATION_CHANNEL = "pixel_pages:tokens:revoke"
+TOKEN_REVOCATION_KEY = "pixel_pages:tokens:not_before"
+
+# Revoked refresh tokens are also rejected by their database row, so only
+# access tokens need the entry to outlive them
+REVOCATION_TTL_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+# User id -> tokens issued before this time are revoked
+_not_before: Dict[str, float] = {}
+
+
+def _prune(now: float) -> None:
+    """Drop revocations that outlived every token issued before them."""
+    expired_before = now - REVOCATION_TTL_SECONDS
+    for user_id in [user_id for user_id, value in _not_before.items() if value < expired_before]:
+        del _not_before[user_id]
+
+
+def _record(user_id: str, not_before: float) -> None:
+    now = time.time()
+    # Revocations are rare, so pruning on each one keeps the dict small
+    _prune(now)
+    if not_before < now - REVOCATION_TTL_SECONDS:
+        return
+    if _not_before.get(user_id, 0.0) < not_before:
+        _not_before[user_id] = not_before
+
+
+def tokens_revoked(payload: dict) -> bool:
+    """Whether a verified token was issued before its user's tokens were revoked."""
+    not_before: Optional[float] = _not_before.get(str(payload.get("sub")))
+    if not_before is None:
+        return False
+    # Tokens without "iat" predate revocation support
+    return payload.get("iat", 0) < not_before
+
+
+add_revocation_check(tokens_revoked)
+
+
+async def revoke_user_tokens(user_id: uuid.UUID) -> None:
+    """Reject every token issued to a user so far, on every API process."""
+    not_before = time.time()
+    _record(str(user_id), not_before)
+
+    try:
+        redis = get_redis()
+        await redis.hset(TOKEN_REVOCATION_KEY, str(user_id), repr(not_before))
+        await redis.publish(TOKEN_REVOCATION_CHANNEL, f"{user_id} {not_before!r}")
+    except RedisError:
+        # Other processes keep accepting the user's tokens until they expire
+        logger.warning("Could not broadcast token revocation of user %s", user_id, exc_info=True)
+
+
+def _apply(message: str) -> None:
+    try:
+        user_id, not_before = message.split()
+        _record(str(uuid.UUID(user_id)), float(not_before))
+    except ValueError:
+        pass
+
+
+async def _load_revocations() -> None:
+    """Apply the stored revocations and drop those that outlived every token."""
+    redis = get_redis()
+    stored = await redis.hgetall(TOKEN_REVOCATION_KEY)
+    expired_before = time.time() - REVOCATION_TTL_SECONDS
+
+    expired = []
+    for user_id, not_before in stored.items():
+        try:
+            value = float(not_before)
+        except ValueError:
+            value = 0.0
+        if value < expired_before:
+            expired.append(user_id)
+        else:
+            _apply(f"{user_id} {not_before}")
+    if expired:
+        await redis.hdel(TOKEN_REVOCATION_KEY, *expired)
+
+
+async def listen_for_token_revocations() -> None:
+    """Apply revocations made by other API processes until cancelled."""
+    backoff = 1.0
+
+    while True:
+        try:
+            async with get_redis().pubsub() as pubsub:
+                await pubsub.subscribe(TOKEN_REVOCATION_CHANNEL)
+                # Subscribed first, so nothing revoked after this read is missed
+                await _load_revocations()
+                backoff = 1.0
+
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        _apply(message["data"])
+
+        except (RedisError, OSError):
+            logger.warning("Token revocation listener disconnected, retrying in %.0fs", backoff)
+
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 30.0)
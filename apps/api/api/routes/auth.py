@@ -8,17 +8,19 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..auth import (
     create_access_token,
     create_refresh_token,
-    get_password_hash,
+    get_password_hash_async,
     revoke_all_user_tokens,
-    revoke_refresh_token,
+    revoke_refresh_token_jti,
     store_refresh_token,
-    verify_password,
+    verify_password_async,
     ACCESS_TOKEN_EXPIRE_MINUTES,
     REFRESH_TOKEN_EXPIRE_DAYS,
 )
+from ..cache import invalidate_user
 from ..database import get_database_session
 from ..dependencies import get_current_user, verify_refresh_token_cookie
 from ..models import User
+from ..revocation import revoke_user_tokens
 from ..schemas import (
     MessageResponse,
     TokenRefreshResponse,
@@ -46,7 +48,7 @@ async def register(
             detail="Email already registered"
         )
     
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     new_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -70,7 +72,7 @@ async def login(
     result = await db.execute(stmt)
     user = result.scalar_one_or_none()
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    if not user or not await verify_password_async(user_credentials.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -152,7 +154,9 @@ async def logout(
     payload: dict = Depends(verify_refresh_token_cookie),
     db: AsyncSession = Depends(get_database_session)
 ):
-    refresh_token = payload.get("jti")  # JWT ID
+    refresh_token_jti = payload.get("jti")  # JWT ID
+    if refresh_token_jti:
+        await revoke_refresh_token_jti(db, uuid.UUID(refresh_token_jti))
     
     response.delete_cookie(
         key="refresh_token",
@@ -174,6 +178,8 @@ async def logout_all(
     db: AsyncSession = Depends(get_database_session)
 ):
     revoked_count = await revoke_all_user_tokens(db, current_user.id)
+    await revoke_user_tokens(current_user.id)
+    await invalidate_user(current_user.id)
     
     response.delete_cookie(
         key="refresh_token",
@@ -209,15 +215,17 @@ async def change_password(
             detail="User not found"
         )
     
-    if not verify_password(old_password, user.hashed_password):
+    if not await verify_password_async(old_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect current password"
         )
     
-    user.hashed_password = get_password_hash(new_password)
+    user.hashed_password = await get_password_hash_async(new_password)
     await db.commit()
     
     await revoke_all_user_tokens(db, user.id)
+    await revoke_user_tokens(user.id)
+    await invalidate_user(user.id)
     
     return MessageResponse(message="Password changed successfully. Please log in again.")
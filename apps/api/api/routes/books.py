@@ -0,0 +1,153 @@
+import asyncio
+import base64
+import binascii
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..assets import AssetResponse, resolve_asset
+from ..database import async_session, get_database_session
+from ..dependencies import get_current_user, get_current_user_unpooled
+from ..library import get_book_owner
+from ..models import Book
+from ..progress import FINAL_STAGES, last_progress, watch_progress
+from ..schemas import BookPage, BookSummary, UserResponse
+
+router = APIRouter(prefix="/books", tags=["books"])
+
+# Seconds between keep-alive comments on idle progress streams
+PROGRESS_HEARTBEAT_SECONDS = 15
+
+
+def _encode_cursor(book: BookSummary) -> str:
+    raw = json.dumps([book.created_at.isoformat(), str(book.id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, book_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), uuid.UUID(book_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+@router.get("", response_model=BookPage)
+async def list_books(
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database_session)
+):
+    # Keyset pagination: every page is one index range scan on
+    # ix_books_owner_id_created_at_id, however deep the cursor is
+    stmt = (
+        select(
+            Book.id,
+            Book.title,
+            Book.author,
+            Book.cover_image_path,
+            Book.processed,
+            Book.created_at,
+        )
+        .where(Book.owner_id == current_user.id)
+        .order_by(Book.created_at.desc(), Book.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        stmt = stmt.where(tuple_(Book.created_at, Book.id) < tuple_(*_decode_cursor(cursor)))
+
+    rows = (await db.execute(stmt)).all()
+    items = [BookSummary.model_validate(row) for row in rows[:limit]]
+    next_cursor = _encode_cursor(items[-1]) if len(rows) > limit else None
+    return BookPage(items=items, next_cursor=next_cursor)
+
+
+@router.get("/{book_id}/assets/{asset_path:path}")
+async def get_book_asset(
+    book_id: uuid.UUID,
+    asset_path: str,
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database_session)
+):
+    owner_id = await get_book_owner(db, book_id)
+    if owner_id is None or owner_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Book not found"
+        )
+
+    asset = await resolve_asset(str(book_id), asset_path, request.headers.get("accept-encoding"))
+    if asset is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Asset not found"
+        )
+
+    version = request.query_params.get("v")
+    immutable = asset.sha256 is not None and version == asset.sha256
+    return AssetResponse(asset, request.headers, immutable=immutable)
+
+
+def _sse(event: dict) -> str:
+    event = {**event, "relayed_at": time.time()}
+    return f"event: progress\ndata: {json.dumps(event)}\n\n"
+
+
+@router.get("/{book_id}/progress")
+async def stream_book_progress(
+    book_id: uuid.UUID,
+    current_user: UserResponse = Depends(get_current_user_unpooled)
+):
+    # A request-scoped session would stay checked out until the stream ends
+    async with async_session() as db:
+        result = await db.execute(select(Book.owner_id, Book.processed).where(Book.id == book_id))
+        row = result.one_or_none()
+    if row is None or row.owner_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Book not found"
+        )
+    processed = row.processed
+
+    async def events():
+        async with watch_progress(book_id) as queue:
+            # Subscribed first, so nothing published after this read is missed
+            last = await last_progress(book_id)
+            if last is None and processed:
+                last = {"book_id": str(book_id), "stage": "done"}
+            if last is not None:
+                yield _sse(last)
+                if last["stage"] in FINAL_STAGES:
+                    return
+            seen = last.get("published_at", 0) if last else 0
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), PROGRESS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event.get("published_at", 0) <= seen:
+                    continue
+                yield _sse(event)
+                if event["stage"] in FINAL_STAGES:
+                    return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,51 @@
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_database_session
+from ..dependencies import get_current_user
+from ..library import get_book_owner, owned_book_ids
+from ..reading_progress import buffer_progress, get_progress
+from ..schemas import (
+    ReadingProgressBatch,
+    ReadingProgressBatchResult,
+    ReadingProgressResponse,
+    UserResponse,
+)
+
+router = APIRouter(prefix="/reading-progress", tags=["reading progress"])
+
+
+@router.post("/batch", response_model=ReadingProgressBatchResult, status_code=status.HTTP_202_ACCEPTED)
+async def save_reading_progress(
+    batch: ReadingProgressBatch,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database_session)
+):
+    owned = await owned_book_ids(db, current_user.id, (update.book_id for update in batch.updates))
+    accepted = [update for update in batch.updates if update.book_id in owned]
+    rejected = sorted({update.book_id for update in batch.updates} - owned, key=str)
+
+    if accepted:
+        await buffer_progress(current_user.id, accepted)
+
+    return ReadingProgressBatchResult(accepted=len(accepted), rejected=rejected)
+
+
+@router.get("/{book_id}", response_model=ReadingProgressResponse)
+async def read_reading_progress(
+    book_id: uuid.UUID,
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database_session)
+):
+    progress = None
+    if await get_book_owner(db, book_id) == current_user.id:
+        progress = await get_progress(db, current_user.id, book_id)
+
+    if progress is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No reading progress for this book"
+        )
+    return progress
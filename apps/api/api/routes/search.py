@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_database_session
+from ..dependencies import get_current_user
+from ..schemas import SearchHit, SearchResults, UserResponse
+from ..search import search_books
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("", response_model=SearchResults)
+async def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    current_user: UserResponse = Depends(get_current_user),
+    db: AsyncSession = Depends(get_database_session)
+):
+    hits = await search_books(db, current_user.id, q, limit)
+    return SearchResults(query=q, hits=[SearchHit(**hit) for hit in hits])
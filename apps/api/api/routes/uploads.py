@@ -0,0 +1,112 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+
+from ..database import async_session
+from ..dependencies import get_current_user, get_current_user_unpooled
+from ..schemas import MessageResponse, UploadCreate, UploadResponse, UserResponse
+from ..uploads import (
+    MultipartFile,
+    Upload,
+    append_chunks,
+    check_file_type,
+    complete_upload,
+    create_upload,
+    discard_upload,
+    get_upload,
+)
+
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+
+async def _finish(upload: Upload, offset: int) -> UploadResponse:
+    # Bodies are streamed without a session; a connection is only taken
+    # once the upload is complete
+    async with async_session() as db:
+        book, task_id = await complete_upload(db, upload)
+    return UploadResponse(
+        upload_id=upload.id,
+        offset=offset,
+        size=offset,
+        complete=True,
+        book_id=book.id,
+        task_id=task_id,
+    )
+
+
+@router.post("", response_model=UploadResponse, status_code=status.HTTP_201_CREATED)
+async def upload_epub(
+    request: Request,
+    bulk: bool = Query(False),
+    current_user: UserResponse = Depends(get_current_user_unpooled)
+):
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("multipart/form-data"):
+        body = MultipartFile(content_type, request.stream())
+        upload = create_upload(current_user.id, "Untitled.epub", None, bulk)
+        try:
+            offset = await append_chunks(upload, 0, body.chunks())
+            if not body.found:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Missing file field"
+                )
+            check_file_type(body.filename, body.content_type)
+        except BaseException:
+            discard_upload(upload)
+            raise
+        upload.filename = body.filename or upload.filename
+    else:
+        filename = request.headers.get("x-filename", "Untitled.epub")
+        check_file_type(filename, content_type)
+        upload = create_upload(current_user.id, filename, None, bulk)
+        try:
+            offset = await append_chunks(upload, 0, request.stream())
+        except BaseException:
+            discard_upload(upload)
+            raise
+
+    return await _finish(upload, offset)
+
+
+@router.post("/resumable", response_model=UploadResponse, status_code=status.HTTP_201_CREATED)
+async def create_resumable_upload(
+    upload_data: UploadCreate,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    check_file_type(upload_data.filename, upload_data.content_type)
+    upload = create_upload(current_user.id, upload_data.filename, upload_data.size, upload_data.bulk)
+    return UploadResponse(upload_id=upload.id, offset=0, size=upload.size)
+
+
+@router.get("/resumable/{upload_id}", response_model=UploadResponse)
+async def get_resumable_upload(
+    upload_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    upload = get_upload(current_user.id, upload_id)
+    return UploadResponse(upload_id=upload.id, offset=upload.offset(), size=upload.size)
+
+
+@router.patch("/resumable/{upload_id}", response_model=UploadResponse)
+async def append_resumable_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    current_user: UserResponse = Depends(get_current_user_unpooled)
+):
+    upload = get_upload(current_user.id, upload_id)
+    offset = await append_chunks(upload, upload_offset, request.stream())
+
+    if offset < upload.size:
+        return UploadResponse(upload_id=upload.id, offset=offset, size=upload.size)
+    return await _finish(upload, offset)
+
+
+@router.delete("/resumable/{upload_id}", response_model=MessageResponse)
+async def cancel_resumable_upload(
+    upload_id: str,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    upload = get_upload(current_user.id, upload_id)
+    discard_upload(upload)
+    return MessageResponse(message="Upload cancelled")
@@ -1,7 +1,8 @@
 import uuid
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 
 class UserCreate(BaseModel):
@@ -39,3 +40,75 @@ class TokenRefreshResponse(BaseModel):
 
 class MessageResponse(BaseModel):
     message: str
+
+
+class UploadCreate(BaseModel):
+    filename: str
+    size: int
+    content_type: Optional[str] = None
+    bulk: bool = False
+
+
+class UploadResponse(BaseModel):
+    upload_id: str
+    offset: int
+    size: Optional[int]
+    complete: bool = False
+    book_id: Optional[uuid.UUID] = None
+    task_id: Optional[str] = None
+
+
+class BookSummary(BaseModel):
+    id: uuid.UUID
+    title: str
+    author: Optional[str]
+    cover_image_path: Optional[str]
+    processed: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class BookPage(BaseModel):
+    items: List[BookSummary]
+    next_cursor: Optional[str] = None
+
+
+class SearchHit(BaseModel):
+    book_id: uuid.UUID
+    title: str
+    author: Optional[str]
+    cover_image_path: Optional[str]
+    chapter_index: Optional[int]
+    chapter_path: Optional[str]
+    rank: float
+    snippet: str  # HTML, matches wrapped in <mark>
+
+
+class SearchResults(BaseModel):
+    query: str
+    hits: List[SearchHit]
+
+
+class ReadingProgressUpdate(BaseModel):
+    book_id: uuid.UUID
+    cfi: str = Field(..., min_length=1, max_length=2048)
+    percent: float = Field(..., ge=0, le=100)
+    ts: datetime
+
+
+class ReadingProgressBatch(BaseModel):
+    updates: List[ReadingProgressUpdate] = Field(..., max_length=500)
+
+
+class ReadingProgressBatchResult(BaseModel):
+    accepted: int
+    rejected: List[uuid.UUID]  # Books that do not exist or belong to someone else
+
+
+class ReadingProgressResponse(BaseModel):
+    book_id: uuid.UUID
+    cfi: str
+    percent: float
+    ts: datetime
@@ -0,0 +1,139 @@
+"""Full-text search over a user's library.
+
+The worker stores one weighted tsvector per book (title A, author B,
+description C) in ``book_search_documents`` and one per spine chapter
+(chapter text D) in ``chapter_search_documents``. Both are GIN-indexed on
+(owner_id, document), so a search only ever touches the caller's rows.
+Books are ranked by the cover density rank of their metadata plus that of
+their best matching chapter; snippets come from that chapter.
+
+``ts_headline`` reparses the text it is given on every call, so it only
+runs on the final page of ranked books (``ranked`` is materialized with
+its LIMIT) and only over the first ``SEARCH_HEADLINE_CHARS`` characters of
+the chapter. A chapter whose matches all lie beyond that prefix gets its
+opening words as the snippet.
+"""
+
+import html
+import os
+import uuid
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Text search configuration, must match the worker's
+SEARCH_CONFIG = os.getenv("SEARCH_CONFIG", "english")
+
+# Private use characters delimit matches until the snippet is escaped
+_START, _STOP = "\ue000", "\ue001"
+
+# Characters of a chapter searched for the snippet (chapters hold up to
+# SEARCH_TEXT_LIMIT characters, see the worker's ingestion)
+SEARCH_HEADLINE_CHARS = int(os.getenv("SEARCH_HEADLINE_CHARS", "10000"))
+
+HEADLINE_OPTIONS = (
+    f'StartSel="{_START}", StopSel="{_STOP}", MaxWords=35, MinWords=15, '
+    'MaxFragments=2, FragmentDelimiter=" … "'
+)
+
+SEARCH_QUERY = text("""
+    WITH q AS (
+        SELECT websearch_to_tsquery(CAST(:config AS regconfig), :query) AS query
+    ),
+    book_hits AS (
+        SELECT d.book_id, ts_rank_cd(d.document, q.query, 32) AS rank
+        FROM book_search_documents d, q
+        WHERE d.owner_id = :owner_id AND d.document @@ q.query
+    ),
+    chapter_hits AS (
+        SELECT DISTINCT ON (c.book_id)
+            c.book_id, c.chapter_index, c.path, ts_rank_cd(c.document, q.query, 32) AS rank
+        FROM chapter_search_documents c, q
+        WHERE c.owner_id = :owner_id AND c.document @@ q.query
+        ORDER BY c.book_id, rank DESC
+    ),
+    ranked AS MATERIALIZED (
+        SELECT
+            coalesce(bh.book_id, ch.book_id) AS book_id,
+            ch.chapter_index,
+            ch.path,
+            coalesce(bh.rank, 0) + coalesce(ch.rank, 0) AS rank
+        FROM book_hits bh
+        FULL JOIN chapter_hits ch ON ch.book_id = bh.book_id
+        ORDER BY rank DESC, book_id
+        LIMIT :limit
+    )
+    SELECT
+        r.book_id,
+        b.title,
+        b.author,
+        b.cover_image_path,
+        r.chapter_index,
+        r.path AS chapter_path,
+        r.rank,
+        ts_headline(
+            CAST(:config AS regconfig),
+            coalesce(left(c.content, :headline_chars), b.description, b.title),
+            q.query,
+            :headline_options
+        ) AS snippet
+    FROM ranked r
+    JOIN books b ON b.id = r.book_id AND b.owner_id = :owner_id
+    LEFT JOIN chapter_search_documents c
+        ON c.book_id = r.book_id AND c.chapter_index = r.chapter_index
+    CROSS JOIN q
+    ORDER BY r.rank DESC, r.book_id
+""")
+
+COPY_BOOK_DOCUMENT = text("""
+    INSERT INTO book_search_documents (book_id, owner_id, document)
+    SELECT :book_id, :owner_id, document
+    FROM book_search_documents
+    WHERE book_id = :source_book_id
+    ON CONFLICT (book_id) DO NOTHING
+""")
+
+COPY_CHAPTER_DOCUMENTS = text("""
+    INSERT INTO chapter_search_documents (book_id, chapter_index, owner_id, path, content, document)
+    SELECT :book_id, chapter_index, :owner_id, path, content, document
+    FROM chapter_search_documents
+    WHERE book_id = :source_book_id
+    ON CONFLICT (book_id, chapter_index) DO NOTHING
+""")
+
+
+def _render_snippet(snippet: str) -> str:
+    """Escape a headline and turn its match delimiters into ``<mark>`` tags."""
+    return html.escape(snippet).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+async def search_books(db: AsyncSession, owner_id: uuid.UUID, query: str, limit: int) -> List[dict]:
+    """Return the best matching books of a user, with highlighted snippets."""
+    result = await db.execute(SEARCH_QUERY, {
+        "config": SEARCH_CONFIG,
+        "query": query,
+        "owner_id": owner_id,
+        "limit": limit,
+        "headline_options": HEADLINE_OPTIONS,
+        "headline_chars": SEARCH_HEADLINE_CHARS,
+    })
+
+    hits = []
+    for row in result.mappings():
+        hit = dict(row)
+        hit["snippet"] = _render_snippet(hit["snippet"] or "")
+        hits.append(hit)
+    return hits
+
+
+async def copy_search_documents(
+    db: AsyncSession,
+    source_book_id: uuid.UUID,
+    book_id: uuid.UUID,
+    owner_id: uuid.UUID,
+) -> None:
+    """Index a book completed from an identical book under the same documents."""
+    params = {"source_book_id": source_book_id, "book_id": book_id, "owner_id": owner_id}
+    await db.execute(COPY_BOOK_DOCUMENT, params)
+    await db.execute(COPY_CHAPTER_DOCUMENTS, params)
@@ -0,0 +1,69 @@
+"""Local file storage shared with the worker."""
+
+import json
+import os
+from pathlib import Path
+
+# Root of the storage volume shared with the worker
+STORAGE_PATH = Path(os.getenv("STORAGE_PATH", "storage"))
+
+BOOKS_DIR = STORAGE_PATH / "books"
+UPLOADS_DIR = STORAGE_PATH / "uploads"
+
+
+def to_storage_path(path: Path) -> str:
+    """Path under STORAGE_PATH as recorded in the database, relative to it.
+
+    The API and the worker may mount the storage volume at different
+    places, so stored paths never depend on either process's layout.
+    """
+    return path.relative_to(STORAGE_PATH).as_posix()
+
+
+def resolve_storage_path(stored: str) -> Path:
+    """Local path of a path recorded by :func:`to_storage_path`.
+
+    Absolute paths recorded before paths were stored relative to
+    STORAGE_PATH are returned unchanged.
+    """
+    return STORAGE_PATH / stored
+
+
+def book_dir(book_id) -> Path:
+    """Return the storage directory of a processed book."""
+    return BOOKS_DIR / str(book_id)
+
+
+def user_upload_dir(user_id) -> Path:
+    """Return the directory holding a user's uploaded EPUBs."""
+    return UPLOADS_DIR / "users" / str(user_id)
+
+
+def link_book_assets(source_book_id, book_id) -> None:
+    """Expose the processed assets of one book under another book's id.
+
+    Every file is hard-linked, so nothing is copied and the worker's
+    link-count based reference counting keeps both books safe to delete.
+    Only manifest.json is rewritten, to carry the new book id.
+    """
+    source = book_dir(source_book_id)
+    destination = book_dir(book_id)
+
+    for root, _, files in os.walk(source):
+        target = destination / Path(root).relative_to(source)
+        target.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            if name == "manifest.json" and Path(root) == source:
+                continue
+            link = target / name
+            link.unlink(missing_ok=True)
+            os.link(Path(root) / name, link)
+
+    with open(source / "manifest.json") as f:
+        manifest = json.load(f)
+    manifest["book_id"] = str(book_id)
+
+    staging = destination / "manifest.json.part"
+    with open(staging, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(staging, destination / "manifest.json")
@@ -0,0 +1,341 @@
+"""Streaming, resumable EPUB uploads.
+
+Request bodies are written straight to
+``storage/uploads/users/{user_id}/{upload_id}.epub.part`` in fixed-size
+chunks, so memory use per upload is bounded by ``UPLOAD_CHUNK_SIZE`` no
+matter how large the book is. The size limit is enforced while streaming
+and the SHA-256 of the file is computed as the bytes arrive.
+
+An upload is either sent in one request, or created first and then filled
+by appending chunks at the offset reported by the server, so an
+interrupted transfer resumes where it stopped. Hash state is kept in
+process memory between chunks; a chunk landing on another API process
+rehashes the bytes already on disk instead.
+
+Completed uploads are renamed to ``{upload_id}.epub`` and handed to
+:func:`api.ingestion.start_ingestion`.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException, status
+from multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import TTLCache
+from .ingestion import HASH_CHUNK_SIZE, start_ingestion
+from .models import Book
+from .storage import to_storage_path, user_upload_dir
+
+MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "50"))
+MAX_UPLOAD_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+
+ALLOWED_FILE_TYPES = set(os.getenv("ALLOWED_FILE_TYPES", "application/epub+zip").split(","))
+
+# Bytes buffered before each write to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+ZIP_MAGIC = b"PK\x03\x04"
+
+# Upload id -> (offset, hasher) for uploads in progress on this process
+_hashers: TTLCache[str, Tuple[int, "hashlib._Hash"]] = TTLCache(max_size=1024, ttl=24 * 3600)
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+@dataclass
+class Upload:
+    id: str
+    user_id: str
+    filename: str
+    size: Optional[int]  # Declared total size, None when sent in one request
+    bulk: bool = False  # Part of a bulk import, ingested on the bulk queue
+
+    @property
+    def directory(self) -> Path:
+        return user_upload_dir(self.user_id)
+
+    @property
+    def part_path(self) -> Path:
+        return self.directory / f"{self.id}.epub.part"
+
+    @property
+    def meta_path(self) -> Path:
+        return self.directory / f"{self.id}.json"
+
+    @property
+    def file_path(self) -> Path:
+        return self.directory / f"{self.id}.epub"
+
+    def offset(self) -> int:
+        try:
+            return self.part_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the {MAX_FILE_SIZE_MB} MB upload limit"
+    )
+
+
+def check_file_type(filename: Optional[str], content_type: Optional[str]) -> None:
+    """Reject files that are neither an allowed type nor named ``*.epub``."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type in ALLOWED_FILE_TYPES or (filename or "").lower().endswith(".epub"):
+        return
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Only EPUB files can be uploaded"
+    )
+
+
+def create_upload(user_id: uuid.UUID, filename: str, size: Optional[int], bulk: bool = False) -> Upload:
+    """Register a new upload and create its empty part file."""
+    if size is not None and size > MAX_UPLOAD_BYTES:
+        raise _too_large()
+
+    upload = Upload(id=uuid.uuid4().hex, user_id=str(user_id), filename=filename, size=size, bulk=bulk)
+    upload.directory.mkdir(parents=True, exist_ok=True)
+    upload.part_path.touch()
+    upload.meta_path.write_text(json.dumps(asdict(upload)))
+    return upload
+
+
+def get_upload(user_id: uuid.UUID, upload_id: str) -> Upload:
+    """Load an unfinished upload of a user."""
+    try:
+        uuid.UUID(hex=upload_id)
+        upload = Upload(**json.loads((user_upload_dir(user_id) / f"{upload_id}.json").read_text()))
+    except (ValueError, FileNotFoundError):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    return upload
+
+
+def discard_upload(upload: Upload) -> None:
+    _hashers.pop(upload.id)
+    _locks.pop(upload.id, None)
+    upload.part_path.unlink(missing_ok=True)
+    upload.meta_path.unlink(missing_ok=True)
+
+
+def _hash_prefix(path: Path, length: int) -> "hashlib._Hash":
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        while length > 0:
+            chunk = f.read(min(HASH_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            length -= len(chunk)
+    return hasher
+
+
+async def _resume_hasher(upload: Upload, offset: int) -> "hashlib._Hash":
+    cached = _hashers.get(upload.id)
+    if cached is not None and cached[0] == offset:
+        return cached[1]
+    return await asyncio.to_thread(_hash_prefix, upload.part_path, offset)
+
+
+async def append_chunks(upload: Upload, offset: int, chunks: AsyncIterator[bytes]) -> int:
+    """Append a streamed body to an upload at ``offset``.
+
+    Bytes that reached the disk before the client disconnected are kept,
+    so the upload can be resumed from the new offset.
+
+    Returns:
+        int: Offset after the appended bytes
+    """
+    lock = _locks.setdefault(upload.id, asyncio.Lock())
+    async with lock:
+        current = upload.offset()
+        if offset != current:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload is at offset {current}",
+                headers={"Upload-Offset": str(current)},
+            )
+
+        limit = min(upload.size, MAX_UPLOAD_BYTES) if upload.size is not None else MAX_UPLOAD_BYTES
+        hasher = await _resume_hasher(upload, offset)
+        written = offset
+        buffer: List[bytes] = []
+        buffered = 0
+
+        async with aiofiles.open(upload.part_path, "ab") as f:
+
+            async def flush() -> None:
+                nonlocal written, buffered
+                data = b"".join(buffer)
+                buffer.clear()
+                buffered = 0
+                await f.write(data)
+                await f.flush()
+                hasher.update(data)
+                written += len(data)
+                _hashers.set(upload.id, (written, hasher))
+
+            try:
+                async for chunk in chunks:
+                    if written + buffered + len(chunk) > limit:
+                        # Drop everything this request appended
+                        buffer.clear()
+                        await f.truncate(offset)
+                        _hashers.pop(upload.id)
+                        if upload.size is not None and limit == upload.size:
+                            raise HTTPException(
+                                status_code=status.HTTP_400_BAD_REQUEST,
+                                detail=f"Upload is larger than the declared {upload.size} bytes"
+                            )
+                        raise _too_large()
+
+                    buffer.append(chunk)
+                    buffered += len(chunk)
+                    if buffered >= UPLOAD_CHUNK_SIZE:
+                        await flush()
+            finally:
+                if buffer:
+                    await flush()
+
+    return written
+
+
+async def complete_upload(db: AsyncSession, upload: Upload) -> Tuple[Book, Optional[str]]:
+    """Turn a fully received upload into a book and start its ingestion.
+
+    Returns:
+        Tuple[Book, Optional[str]]: The new book and the Celery task id, or
+        None if it was completed from an identical book
+    """
+    size = upload.offset()
+    hasher = await _resume_hasher(upload, size)
+
+    async with aiofiles.open(upload.part_path, "rb") as f:
+        magic = await f.read(len(ZIP_MAGIC))
+    if magic != ZIP_MAGIC:
+        discard_upload(upload)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File is not an EPUB archive"
+        )
+
+    os.replace(upload.part_path, upload.file_path)
+    upload.meta_path.unlink(missing_ok=True)
+    _hashers.pop(upload.id)
+    _locks.pop(upload.id, None)
+
+    book = Book(
+        id=uuid.uuid4(),
+        title=Path(upload.filename).stem[:500] or "Untitled",
+        file_path=to_storage_path(upload.file_path),
+        file_size=size,
+        content_hash=hasher.hexdigest(),
+        owner_id=uuid.UUID(upload.user_id),
+    )
+    db.add(book)
+
+    try:
+        task_id = await start_ingestion(db, book, bulk=upload.bulk)
+    except Exception:
+        await db.rollback()
+        upload.file_path.unlink(missing_ok=True)
+        raise
+    return book, task_id
+
+
+class MultipartFile:
+    """Streams the bytes of one file field out of a multipart request body.
+
+    The body is parsed incrementally; only the bytes of the current request
+    chunk are held in memory. ``filename`` and ``content_type`` are set once
+    the part headers have been read.
+    """
+
+    def __init__(self, content_type_header: str, stream: AsyncIterator[bytes], field_name: str = "file"):
+        _, params = parse_options_header(content_type_header)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Missing boundary in multipart body"
+            )
+
+        self.stream = stream
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self.found = False
+
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_name = b""
+        self._header_value = b""
+        self._in_file = False
+        self._pending: List[bytes] = []
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("latin-1")
+        if name != self.field_name or self.found:
+            return
+
+        self.found = self._in_file = True
+        filename = options.get(b"filename")
+        self.filename = os.path.basename(filename.decode("utf-8", "replace")) if filename else None
+        content_type = self._headers.get(b"content-type")
+        self.content_type = content_type.decode("latin-1") if content_type else None
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._pending.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        self._in_file = False
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """Yield the file field's bytes as the request body arrives."""
+        async for chunk in self.stream:
+            self._parser.write(chunk)
+            if self._pending:
+                data = b"".join(self._pending)
+                self._pending.clear()
+                yield data
+            elif self.found and not self._in_file:
+                # The file field is complete; the rest of the body is ignored
+                break
+        self._parser.finalize()
@@ -11,7 +11,7 @@ from sqlalchemy.ext.asyncio import create_async_engine
 
 # Import your models here
 from api.database import Base
-from api import models  # noqa: F401
+from api import auth, models  # noqa: F401
 
 # this is the Alembic Config object
 config = context.config
@@ -0,0 +1,91 @@
+"""initial schema
+
+Revision ID: 3f1c2a9d8b70
+Revises: 
+Create Date: 2026-10-16 09:00:00.000000+00:00
+
+Tables as previously created by ``create_tables()``. Databases that were
+bootstrapped that way should be stamped with this revision instead of
+running it: ``alembic stamp 3f1c2a9d8b70``.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d8b70'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('hashed_password', sa.String(length=255), nullable=False),
+        sa.Column('full_name', sa.String(length=100), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('is_superuser', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+
+    op.create_table(
+        'books',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('title', sa.String(length=500), nullable=False),
+        sa.Column('author', sa.String(length=255), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('isbn', sa.String(length=20), nullable=True),
+        sa.Column('language', sa.String(length=10), nullable=True),
+        sa.Column('file_path', sa.String(length=500), nullable=False),
+        sa.Column('file_size', sa.Integer(), nullable=False),
+        sa.Column('cover_image_path', sa.String(length=500), nullable=True),
+        sa.Column('processed', sa.Boolean(), nullable=False),
+        sa.Column('owner_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_books_id'), 'books', ['id'], unique=False)
+    op.create_index(op.f('ix_books_isbn'), 'books', ['isbn'], unique=False)
+    op.create_index(op.f('ix_books_owner_id'), 'books', ['owner_id'], unique=False)
+    op.create_index(op.f('ix_books_title'), 'books', ['title'], unique=False)
+
+    op.create_table(
+        'refresh_tokens',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('token', sa.String(length=255), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('is_revoked', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_refresh_tokens_id'), 'refresh_tokens', ['id'], unique=False)
+    op.create_index(op.f('ix_refresh_tokens_token'), 'refresh_tokens', ['token'], unique=True)
+    op.create_index(op.f('ix_refresh_tokens_user_id'), 'refresh_tokens', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_refresh_tokens_user_id'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_token'), table_name='refresh_tokens')
+    op.drop_index(op.f('ix_refresh_tokens_id'), table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
+
+    op.drop_index(op.f('ix_books_title'), table_name='books')
+    op.drop_index(op.f('ix_books_owner_id'), table_name='books')
+    op.drop_index(op.f('ix_books_isbn'), table_name='books')
+    op.drop_index(op.f('ix_books_id'), table_name='books')
+    op.drop_table('books')
+
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,27 @@
+"""add book content hash
+
+Revision ID: 8a4e6d2c1b95
+Revises: 3f1c2a9d8b70
+Create Date: 2026-10-16 09:30:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4e6d2c1b95'
+down_revision: Union[str, None] = '3f1c2a9d8b70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_books_content_hash'), 'books', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_books_content_hash'), table_name='books')
+    op.drop_column('books', 'content_hash')
@@ -0,0 +1,65 @@
+"""key refresh tokens by jti
+
+Revision ID: c71d3e5a9f42
+Revises: 8a4e6d2c1b95
+Create Date: 2026-10-16 10:00:00.000000+00:00
+
+Refresh tokens used to be stored and looked up by their full JWT string.
+They are now keyed by the token's ``jti`` claim (a UUID). Existing rows are
+backfilled by decoding the claim from the stored token's payload segment.
+Downgrading cannot restore the JWT strings and deletes every refresh token.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71d3e5a9f42'
+down_revision: Union[str, None] = '8a4e6d2c1b95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('refresh_tokens', sa.Column('jti', postgresql.UUID(as_uuid=True), nullable=True))
+
+    # base64url payload segment -> padded base64 -> JSON -> jti
+    op.execute("""
+        UPDATE refresh_tokens
+        SET jti = (
+            convert_from(
+                decode(
+                    rpad(
+                        translate(split_part(token, '.', 2), '-_', '+/'),
+                        ((length(split_part(token, '.', 2)) + 3) / 4) * 4,
+                        '='
+                    ),
+                    'base64'
+                ),
+                'UTF8'
+            )::json ->> 'jti'
+        )::uuid
+    """)
+    op.execute("DELETE FROM refresh_tokens WHERE jti IS NULL")
+
+    op.alter_column('refresh_tokens', 'jti', nullable=False)
+    op.create_index(op.f('ix_refresh_tokens_jti'), 'refresh_tokens', ['jti'], unique=True)
+
+    op.drop_index('ix_refresh_tokens_token', table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'token')
+
+    # Duplicates the primary key index
+    op.drop_index('ix_refresh_tokens_id', table_name='refresh_tokens')
+
+
+def downgrade() -> None:
+    op.create_index('ix_refresh_tokens_id', 'refresh_tokens', ['id'], unique=False)
+
+    op.execute("DELETE FROM refresh_tokens")
+    op.add_column('refresh_tokens', sa.Column('token', sa.String(length=255), nullable=False))
+    op.create_index('ix_refresh_tokens_token', 'refresh_tokens', ['token'], unique=True)
+
+    op.drop_index(op.f('ix_refresh_tokens_jti'), table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'jti')
@@ -0,0 +1,25 @@
+"""index refresh token expiry
+
+Revision ID: 5b2f8c7e4d16
+Revises: c71d3e5a9f42
+Create Date: 2026-10-16 10:30:00.000000+00:00
+
+Lets the batched expiry purge find expired rows without scanning the table.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2f8c7e4d16'
+down_revision: Union[str, None] = 'c71d3e5a9f42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_refresh_tokens_expires_at'), 'refresh_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_refresh_tokens_expires_at'), table_name='refresh_tokens')
@@ -0,0 +1,35 @@
+"""add books library index
+
+Revision ID: d4a9b3e61c27
+Revises: 5b2f8c7e4d16
+Create Date: 2026-10-16 11:00:00.000000+00:00
+
+Keyset pagination of a user's library, newest first. The single-column
+owner index is dropped: the composite index serves those lookups too.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a9b3e61c27'
+down_revision: Union[str, None] = '5b2f8c7e4d16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_books_owner_id_created_at_id',
+        'books',
+        ['owner_id', sa.text('created_at DESC'), sa.text('id DESC')],
+        unique=False,
+        postgresql_include=['title', 'author', 'cover_image_path', 'processed'],
+    )
+    op.drop_index(op.f('ix_books_owner_id'), table_name='books')
+
+
+def downgrade() -> None:
+    op.create_index(op.f('ix_books_owner_id'), 'books', ['owner_id'], unique=False)
+    op.drop_index('ix_books_owner_id_created_at_id', table_name='books')
@@ -0,0 +1,55 @@
+"""add search documents
+
+Revision ID: e2b7c9a4f318
+Revises: d4a9b3e61c27
+Create Date: 2026-10-16 11:30:00.000000+00:00
+
+Full-text search over book metadata and chapter text. The GIN indexes
+cover (owner_id, document) through the btree_gin extension, so searches
+stay within one user's books without a separate filter step.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c9a4f318'
+down_revision: Union[str, None] = 'd4a9b3e61c27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+
+    op.create_table(
+        'book_search_documents',
+        sa.Column('book_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('owner_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('document', postgresql.TSVECTOR(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('book_id'),
+    )
+    op.create_index('ix_book_search_documents_owner_id_document', 'book_search_documents', ['owner_id', 'document'], unique=False, postgresql_using='gin')
+
+    op.create_table(
+        'chapter_search_documents',
+        sa.Column('book_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('chapter_index', sa.Integer(), nullable=False),
+        sa.Column('owner_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('path', sa.String(length=500), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('document', postgresql.TSVECTOR(), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('book_id', 'chapter_index'),
+    )
+    op.create_index('ix_chapter_search_documents_owner_id_document', 'chapter_search_documents', ['owner_id', 'document'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chapter_search_documents_owner_id_document', table_name='chapter_search_documents', postgresql_using='gin')
+    op.drop_table('chapter_search_documents')
+    op.drop_index('ix_book_search_documents_owner_id_document', table_name='book_search_documents', postgresql_using='gin')
+    op.drop_table('book_search_documents')
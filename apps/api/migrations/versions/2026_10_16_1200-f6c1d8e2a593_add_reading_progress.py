@@ -0,0 +1,36 @@
+"""add reading progress
+
+Revision ID: f6c1d8e2a593
+Revises: e2b7c9a4f318
+Create Date: 2026-10-16 12:00:00.000000+00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6c1d8e2a593'
+down_revision: Union[str, None] = 'e2b7c9a4f318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'reading_progress',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('book_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('cfi', sa.Text(), nullable=False),
+        sa.Column('percent', sa.Float(), nullable=False),
+        sa.Column('client_updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'book_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reading_progress')
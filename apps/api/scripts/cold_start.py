@@ -0,0 +1,108 @@
+"""Measure the API's cold start.
+
+Reports, as JSON, how long a fresh interpreter takes to import
+``api.main`` and how long a freshly spawned uvicorn takes to answer its
+first request. Run from ``apps/api``:
+
+    python scripts/cold_start.py --runs 5
+
+Boot runs the schema version check against ``DATABASE_URL``; pass
+``SCHEMA_CHECK=off`` to time the API without a database.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import api.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import() -> float:
+    """Seconds a fresh interpreter spends importing the application."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=API_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_first_request(path: str, timeout: float) -> float:
+    """Seconds from spawning uvicorn to the first successful response."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=API_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    response.read()
+                return time.perf_counter() - started
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.005)
+        raise RuntimeError(f"No response from {url} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _summary(samples: list) -> dict:
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+        "samples_ms": [round(sample * 1000, 1) for sample in samples],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/", help="Path of the first request")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    first_requests = [measure_first_request(args.path, args.timeout) for _ in range(args.runs)]
+
+    print(json.dumps({
+        "python": sys.version.split()[0],
+        "schema_check": os.getenv("SCHEMA_CHECK", "strict"),
+        "runs": args.runs,
+        "import": _summary(imports),
+        "first_request": _summary(first_requests),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""EPUB reading and normalization."""
@@ -0,0 +1,70 @@
+"""Read-only access to EPUB (OCF ZIP) containers without extracting them."""
+
+import posixpath
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+from urllib.parse import unquote
+from zipfile import BadZipFile, ZipFile, ZipInfo
+
+CONTAINER_PATH = "META-INF/container.xml"
+
+
+class EpubError(Exception):
+    """Raised when an EPUB container is malformed or unsafe to process."""
+
+
+class EpubArchive:
+    """An EPUB file opened directly from its ZIP container.
+
+    Members are only ever read as streams, so nothing is extracted to disk
+    unless the caller writes it somewhere itself.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        try:
+            self._zip = ZipFile(path, "r")
+        except BadZipFile as e:
+            raise EpubError(f"Invalid EPUB: {e}") from e
+
+        # Archive member names are case-sensitive; index them once for lookups
+        self._members = {info.filename: info for info in self._zip.infolist() if not info.is_dir()}
+
+    def __enter__(self) -> "EpubArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._members
+
+    def info(self, name: str) -> Optional[ZipInfo]:
+        return self._members.get(name)
+
+    def open(self, name: str) -> BinaryIO:
+        """Open an archive member as a decompressing stream."""
+        if name not in self._members:
+            raise EpubError(f"Invalid EPUB: missing {name}")
+        return self._zip.open(self._members[name], "r")
+
+    def read(self, name: str) -> bytes:
+        with self.open(name) as member:
+            return member.read()
+
+
+def resolve_href(base_dir: str, href: str) -> str:
+    """Resolve a manifest href against the directory of the referencing file.
+
+    Raises:
+        EpubError: If the href escapes the archive root
+    """
+    path = unquote(href.split("#", 1)[0])
+    resolved = posixpath.normpath(posixpath.join(base_dir, path))
+
+    if resolved.startswith("../") or resolved == ".." or posixpath.isabs(resolved):
+        raise EpubError(f"Invalid EPUB: href escapes container: {href}")
+
+    return resolved
@@ -0,0 +1,194 @@
+"""Responsive image renditions and library thumbnails.
+
+Every raster image is decoded once and downscaled into a small set of WebP
+renditions, so readers can fetch the smallest one that fits their screen.
+JPEGs are decoded straight at reduced scale with ``Image.draft``; other
+formats are shrunk with ``Image.reduce`` before the final resample. Pillow
+releases the GIL while decoding, resampling and encoding, so images are
+processed on a thread pool sized by ``IMAGE_WORKERS``.
+
+Renditions are stored as blobs and recorded under a hint keyed by the
+source image digest, so an image shared between books is rendered once.
+"""
+
+import logging
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from ..storage import link_blob, read_hint, store_file, write_hint
+
+logger = logging.getLogger(__name__)
+
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "0")) or os.cpu_count() or 1
+
+RENDITION_WIDTHS = tuple(
+    sorted(int(width) for width in os.getenv("IMAGE_RENDITION_WIDTHS", "480,960,1600").split(","))
+)
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "320"))
+WEBP_QUALITY = int(os.getenv("WEBP_QUALITY", "80"))
+
+# Library thumbnail, relative to the book directory
+THUMBNAIL_PATH = "thumbnail.webp"
+
+# Vector and animated formats are served as they are
+RASTER_MEDIA_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/webp", "image/bmp", "image/tiff"}
+
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ImageJob:
+    file: str  # Absolute path of the stored image
+    storage_path: str  # Path relative to the book directory
+    sha256: str
+    thumbnail: bool = False
+
+
+def _hint(sha256: str, width: int) -> str:
+    return f"webp-{sha256}-{width}-q{WEBP_QUALITY}"
+
+
+def _oriented_size(image: Image.Image) -> Tuple[int, int]:
+    orientation = image.getexif().get(0x0112)
+    if orientation in TRANSPOSED_ORIENTATIONS:
+        return image.height, image.width
+    return image.size
+
+
+def _target_sizes(width: int, height: int, widths: Tuple[int, ...]) -> List[Tuple[int, int]]:
+    sizes = [(w, max(1, round(height * w / width))) for w in widths if w < width]
+    if not sizes:
+        # Smaller than every rendition: still worth re-encoding as WebP
+        sizes = [(width, height)]
+    return sizes
+
+
+def _decode(path: Path, largest: Tuple[int, int]) -> Image.Image:
+    """Decode an image at the smallest scale that still covers ``largest``."""
+    image = Image.open(path)
+
+    if image.format == "JPEG":
+        transposed = image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS
+        image.draft("RGB", largest[::-1] if transposed else largest)
+
+    image = ImageOps.exif_transpose(image)
+
+    factor = min(image.width // largest[0], image.height // largest[1])
+    if factor >= 2:
+        image = image.reduce(factor)
+
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    return image
+
+
+def render_image(job: ImageJob, book_directory: Path) -> Optional[dict]:
+    """Produce the WebP renditions, and optionally the thumbnail, of an image.
+
+    Args:
+        job: The stored source image
+        book_directory: Directory of the book the image belongs to
+
+    Returns:
+        Optional[dict]: Original dimensions, renditions (smallest first) and
+        thumbnail path, or None when the image is not a decodable raster
+    """
+    try:
+        with Image.open(job.file) as probe:
+            if getattr(probe, "is_animated", False):
+                return None
+            width, height = _oriented_size(probe)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning("Skipping undecodable image %s", job.storage_path, exc_info=True)
+        return None
+
+    stem = posixpath.splitext(posixpath.basename(job.storage_path))[0]
+    directory = posixpath.join(posixpath.dirname(job.storage_path), "renditions")
+    targets = {
+        size: posixpath.join(directory, f"{stem}-{size[0]}w.webp")
+        for size in _target_sizes(width, height, RENDITION_WIDTHS)
+    }
+
+    thumbnail_size = None
+    if job.thumbnail:
+        thumbnail_size = _target_sizes(width, height, (THUMBNAIL_WIDTH,))[0]
+        targets.setdefault(thumbnail_size, THUMBNAIL_PATH)
+
+    outputs: Dict[Tuple[int, int], dict] = {}
+    missing = []
+
+    for size, path in targets.items():
+        digest = read_hint(_hint(job.sha256, size[0]))
+        size_bytes = link_blob(digest, book_directory / path) if digest else None
+        if size_bytes is None:
+            missing.append((size, path))
+        else:
+            outputs[size] = {"path": path, "bytes": size_bytes, "sha256": digest}
+
+    if missing:
+        try:
+            image = _decode(Path(job.file), max(size for size, _ in missing))
+            # Largest first, so each step resamples from the previous one
+            for size, path in sorted(missing, reverse=True):
+                if image.size != size:
+                    image = image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+                staging = book_directory / (path + ".part")
+                staging.parent.mkdir(parents=True, exist_ok=True)
+                image.save(staging, "WEBP", quality=WEBP_QUALITY, method=4)
+                digest, size_bytes = store_file(staging, book_directory / path)
+                write_hint(_hint(job.sha256, size[0]), digest)
+                outputs[size] = {"path": path, "bytes": size_bytes, "sha256": digest}
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.warning("Failed to render image %s", job.storage_path, exc_info=True)
+            return None
+
+    result = {"width": width, "height": height, "renditions": [], "thumbnail": None}
+    for size in sorted(outputs):
+        entry = {"width": size[0], "height": size[1], **outputs[size]}
+        if entry["path"] != THUMBNAIL_PATH:
+            result["renditions"].append(entry)
+        if size == thumbnail_size:
+            if entry["path"] != THUMBNAIL_PATH:
+                link_blob(entry["sha256"], book_directory / THUMBNAIL_PATH)
+            result["thumbnail"] = {**entry, "path": THUMBNAIL_PATH}
+
+    return result
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="images")
+        return _executor
+
+
+def render_images(
+    jobs: List[ImageJob],
+    book_directory: Path,
+    timeout: Optional[float] = None,
+) -> Iterator[Optional[dict]]:
+    """Render images on the shared thread pool, yielding results in job order.
+
+    Raises:
+        TimeoutError: If pooled renders are not finished within ``timeout``
+            seconds; renders not started yet are cancelled
+    """
+    render = partial(render_image, book_directory=book_directory)
+    if len(jobs) < 2 or IMAGE_WORKERS <= 1:
+        return (render(job) for job in jobs)
+    return _get_executor().map(render, jobs, timeout=timeout)
@@ -0,0 +1,127 @@
+"""Reader manifest (manifest.json) construction."""
+
+from typing import Dict, List
+
+from .parser import Package, TocEntry
+
+MANIFEST_VERSION = 2
+
+
+def _toc_json(entries: List[TocEntry], paths: Dict[str, str]) -> List[dict]:
+    toc = []
+    for entry in entries:
+        if entry.path not in paths:
+            # Entry points at something that was not stored; keep its children
+            toc.extend(_toc_json(entry.children, paths))
+            continue
+        toc.append({
+            "title": entry.title,
+            "path": paths[entry.path],
+            "fragment": entry.fragment or None,
+            "children": _toc_json(entry.children, paths),
+        })
+    return toc
+
+
+def build_manifest(
+    book_id: str,
+    package: Package,
+    toc: List[TocEntry],
+    assets: Dict[str, dict],
+) -> dict:
+    """Build the manifest the reader loads instead of the original EPUB.
+
+    Args:
+        book_id: UUID of the book record
+        package: Parsed package document
+        toc: Parsed table of contents
+        assets: Stored manifest items keyed by item id. Each value holds at
+            least ``path`` (relative to the book directory), ``category``,
+            ``bytes`` and ``sha256``; chapters also carry ``words``, and
+            chapters and stylesheets the sizes of their precompressed
+            variants in ``encodings``. Images,
+            fonts and stylesheets are links to the blob with that digest.
+            Rendered images also carry ``width``, ``height`` and
+            ``renditions``, and the cover its ``thumbnail``.
+
+    Returns:
+        dict: JSON-serializable manifest
+    """
+    metadata = package.metadata
+    creators = metadata.get("creators") or []
+    paths = {package.items[item_id].path: asset["path"] for item_id, asset in assets.items()}
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "book_id": book_id,
+        "title": metadata.get("title"),
+        "author": ", ".join(creators) if creators else None,
+        "creators": creators,
+        "language": metadata.get("language"),
+        "identifier": metadata.get("identifier"),
+        "isbn": metadata.get("isbn"),
+        "publisher": metadata.get("publisher"),
+        "description": metadata.get("description"),
+        "published": metadata.get("date"),
+        "subjects": metadata.get("subjects") or [],
+        "cover": None,
+        "thumbnail": None,
+        "spine": [],
+        "toc": _toc_json(toc, paths),
+        "chapters": [],
+        "documents": [],
+        "images": [],
+        "fonts": [],
+        "css": [],
+        "total_bytes": 0,
+        "total_words": 0,
+        "processing_status": "completed",
+    }
+
+    cover = package.cover_item
+    if cover is not None and cover.id in assets:
+        manifest["cover"] = assets[cover.id]["path"]
+
+    in_spine = set()
+    for item_id in package.spine:
+        asset = assets.get(item_id)
+        if asset is None or asset["category"] != "chapters" or item_id in in_spine:
+            continue
+        in_spine.add(item_id)
+        manifest["spine"].append(asset["path"])
+        manifest["chapters"].append({
+            "id": item_id,
+            "index": len(manifest["chapters"]),
+            "path": asset["path"],
+            "bytes": asset["bytes"],
+            "sha256": asset.get("sha256"),
+            "encodings": asset.get("encodings", {}),
+            "words": asset.get("words", 0),
+        })
+        manifest["total_words"] += asset.get("words", 0)
+
+    for item_id, asset in assets.items():
+        manifest["total_bytes"] += asset["bytes"]
+        if item_id in in_spine:
+            continue
+
+        entry = {
+            "id": item_id,
+            "path": asset["path"],
+            "media_type": package.items[item_id].media_type,
+            "bytes": asset["bytes"],
+            "sha256": asset.get("sha256"),
+        }
+        if "encodings" in asset:
+            entry["encodings"] = asset["encodings"]
+        if "renditions" in asset:
+            entry.update(width=asset["width"], height=asset["height"], renditions=asset["renditions"])
+            if asset.get("thumbnail"):
+                manifest["thumbnail"] = asset["thumbnail"]
+
+        if asset["category"] == "chapters":
+            manifest["documents"].append(entry)
+        else:
+            manifest[asset["category"]].append(entry)
+
+    return manifest
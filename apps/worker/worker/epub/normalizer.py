@@ -0,0 +1,290 @@
+"""Chapter sanitization and link normalization.
+
+Book HTML is untrusted, so every chapter is sanitized before it is
+published: active content (scripts, frames, forms, event handlers and
+``javascript:`` URLs) is stripped, and references between book files are
+rewritten to point at their location in book storage. Stylesheets get
+their ``url()`` references rewritten the same way.
+
+Normalization is CPU-bound, so documents are fanned out over a process pool
+shared by all ingestion tasks running in the worker process. Workers are
+sized with ``NORMALIZE_WORKERS`` (defaults to the number of CPUs). Pools
+cannot be started from daemonic processes such as Celery prefork children;
+there normalization runs serially, so run the ingestion worker with
+``--pool threads`` to get the parallel path. Pool processes are started by
+a fork server rather than forked from the multi-threaded worker, whose
+other threads may hold locks a forked child would inherit.
+
+Normalized documents also get precompressed ``.gz`` and ``.br`` siblings,
+so the API can serve them without compressing at request time. Brotli
+output requires the optional ``brotli`` package.
+"""
+
+import gzip
+import hashlib
+import logging
+import multiprocessing
+import os
+import posixpath
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlsplit
+
+from bs4 import BeautifulSoup, Comment
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+NORMALIZE_WORKERS = int(os.getenv("NORMALIZE_WORKERS", "0")) or os.cpu_count() or 1
+
+# Documents sent to a pool worker per round trip
+NORMALIZE_CHUNK_SIZE = int(os.getenv("NORMALIZE_CHUNK_SIZE", "4"))
+
+UNSAFE_TAGS = ["script", "iframe", "frame", "frameset", "object", "embed", "applet", "form", "input", "button", "base"]
+URL_ATTRIBUTES = {"href", "src", "xlink:href", "poster", "data"}
+UNSAFE_SCHEMES = {"javascript", "vbscript", "livescript"}
+
+# Smaller documents are served as is; compression barely pays off there
+PRECOMPRESS_MIN_BYTES = int(os.getenv("PRECOMPRESS_MIN_BYTES", "512"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "9"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "11"))
+
+# Content-Encoding token -> file suffix of the precompressed sibling
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""", re.IGNORECASE)
+CSS_IMPORT_RE = re.compile(r"""@import\s+(['"])([^'"]+)\1""", re.IGNORECASE)
+CSS_EXPRESSION_RE = re.compile(r"expression\s*\(|-moz-binding|behavior\s*:", re.IGNORECASE)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class NormalizeJob:
+    file: str  # Absolute path of the stored file, rewritten in place
+    archive_path: str  # Member name inside the EPUB, used to resolve links
+    storage_path: str  # Path relative to the book directory
+    media_type: str
+
+
+def _is_unsafe_url(value: str) -> bool:
+    scheme = urlsplit(value.strip()).scheme.lower()
+    if scheme in UNSAFE_SCHEMES:
+        return True
+    return scheme == "data" and not value.strip()[5:].lower().startswith("image/")
+
+
+def _rewrite_url(value: str, job: NormalizeJob, links: Dict[str, str]) -> str:
+    """Rewrite a reference to another book file relative to its stored location."""
+    parts = urlsplit(value.strip())
+    if parts.scheme or parts.netloc or not parts.path or parts.path.startswith("/"):
+        return value
+
+    target = posixpath.normpath(posixpath.join(posixpath.dirname(job.archive_path), unquote(parts.path)))
+    stored = links.get(target)
+    if stored is None:
+        return value
+
+    relative = posixpath.relpath(stored, posixpath.dirname(job.storage_path))
+    return quote(relative) + (f"#{parts.fragment}" if parts.fragment else "")
+
+
+def _rewrite_css(css: str, job: NormalizeJob, links: Dict[str, str]) -> str:
+    def replace_url(match: "re.Match") -> str:
+        url = match.group(2)
+        if _is_unsafe_url(url):
+            return "url()"
+        return f'url("{_rewrite_url(url, job, links)}")'
+
+    def replace_import(match: "re.Match") -> str:
+        return f'@import "{_rewrite_url(match.group(2), job, links)}"'
+
+    css = CSS_EXPRESSION_RE.sub("", css)
+    css = CSS_IMPORT_RE.sub(replace_import, css)
+    return CSS_URL_RE.sub(replace_url, css)
+
+
+def _sanitize_html(markup: bytes, job: NormalizeJob, links: Dict[str, str]) -> Tuple[bytes, int]:
+    is_xml = job.media_type == "application/xhtml+xml"
+    soup = BeautifulSoup(markup, "lxml-xml" if is_xml else "lxml")
+    removed = 0
+
+    for tag in soup.find_all(UNSAFE_TAGS):
+        tag.decompose()
+        removed += 1
+
+    for tag in soup.find_all("meta"):
+        if tag.get("http-equiv", "").lower() == "refresh":
+            tag.decompose()
+            removed += 1
+
+    for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+        comment.extract()
+
+    for tag in soup.find_all(True):
+        for name in list(tag.attrs):
+            value = tag.attrs[name]
+            key = name.lower()
+
+            if key.startswith("on"):
+                del tag.attrs[name]
+                removed += 1
+            elif key in URL_ATTRIBUTES and isinstance(value, str):
+                if _is_unsafe_url(value):
+                    del tag.attrs[name]
+                    removed += 1
+                else:
+                    tag.attrs[name] = _rewrite_url(value, job, links)
+            elif key == "style" and isinstance(value, str):
+                tag.attrs[name] = _rewrite_css(value, job, links)
+
+        if tag.name == "style" and tag.string:
+            tag.string.replace_with(_rewrite_css(tag.string, job, links))
+
+    output = soup.decode() if is_xml else str(soup)
+    return output.encode("utf-8"), removed
+
+
+def _compress(output: bytes, encoding: str) -> Optional[bytes]:
+    if encoding == "gzip":
+        return gzip.compress(output, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(output, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    return None
+
+
+def precompress(path: Path, output: bytes) -> Dict[str, int]:
+    """Write precompressed siblings of a stored document.
+
+    Variants that would not be smaller than the document itself are not
+    kept, so a stale sibling from an earlier ingestion is removed.
+
+    Returns:
+        Dict[str, int]: Compressed size per ``Content-Encoding`` token
+    """
+    encodings = {}
+
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        sibling = path.with_name(path.name + suffix)
+        compressed = _compress(output, encoding) if len(output) >= PRECOMPRESS_MIN_BYTES else None
+
+        if compressed is None or len(compressed) >= len(output):
+            sibling.unlink(missing_ok=True)
+            continue
+
+        partial_path = sibling.with_name(sibling.name + ".part")
+        partial_path.write_bytes(compressed)
+        os.replace(partial_path, sibling)
+        encodings[encoding] = len(compressed)
+
+    return encodings
+
+
+def normalize_document(job: NormalizeJob, links: Dict[str, str]) -> dict:
+    """Sanitize one chapter or stylesheet in place and precompress it.
+
+    Runs inside pool workers, so it only takes and returns picklable values.
+
+    Args:
+        job: The stored document to normalize
+        links: Archive member names mapped to paths relative to the book
+            directory, for every stored item of the book
+
+    Returns:
+        dict: Stored path, resulting size and SHA-256, compressed sizes per
+        encoding, and number of removed constructs
+    """
+    path = Path(job.file)
+    original = path.read_bytes()
+
+    if job.media_type == "text/css":
+        output, removed = _rewrite_css(original.decode("utf-8", "replace"), job, links).encode("utf-8"), 0
+    else:
+        output, removed = _sanitize_html(original, job, links)
+
+    if output != original:
+        partial_path = path.with_name(path.name + ".part")
+        partial_path.write_bytes(output)
+        os.replace(partial_path, path)
+
+    return {
+        "path": job.storage_path,
+        "bytes": len(output),
+        "sha256": hashlib.sha256(output).hexdigest(),
+        "encodings": precompress(path, output),
+        "removed": removed,
+    }
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    # forkserver is POSIX only; spawn is the safe start method elsewhere
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+
+    if NORMALIZE_WORKERS <= 1 or multiprocessing.current_process().daemon:
+        return None
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=NORMALIZE_WORKERS, mp_context=_pool_context())
+        return _executor
+
+
+def _reset_executor() -> None:
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def normalize_documents(
+    jobs: List[NormalizeJob],
+    links: Dict[str, str],
+    timeout: Optional[float] = None,
+) -> Iterator[dict]:
+    """Normalize documents in parallel, yielding results in job order.
+
+    Raises:
+        TimeoutError: If pooled work is not finished within ``timeout``
+            seconds; the pool is replaced so a hung process cannot hold up
+            later books
+    """
+    normalize = partial(normalize_document, links=links)
+    executor = _get_executor()
+
+    if executor is None or len(jobs) < 2:
+        for job in jobs:
+            yield normalize(job)
+        return
+
+    done = 0
+    try:
+        for result in executor.map(normalize, jobs, timeout=timeout, chunksize=NORMALIZE_CHUNK_SIZE):
+            done += 1
+            yield result
+    except TimeoutError:
+        logger.warning("Normalization timed out after %d of %d documents; replacing the pool", done, len(jobs))
+        _reset_executor()
+        raise
+    except BrokenProcessPool:
+        logger.warning("Normalization pool broke; normalizing the rest serially", exc_info=True)
+        _reset_executor()
+        for job in jobs[done:]:
+            yield normalize(job)
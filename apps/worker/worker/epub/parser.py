@@ -0,0 +1,394 @@
+"""Container, package document (OPF) and table of contents parsing.
+
+Everything is parsed incrementally with ``lxml.etree.iterparse`` straight
+from the archive streams. Elements are discarded as soon as they have been
+read, so memory stays bounded even for omnibus editions whose manifests
+list thousands of items, and no full object model of the book is built.
+"""
+
+import posixpath
+import re
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+from .archive import CONTAINER_PATH, EpubArchive, EpubError, resolve_href
+
+CONTAINER_NS = "urn:oasis:names:tc:opendocument:xmlns:container"
+OPF_NS = "http://www.idpf.org/2007/opf"
+DC_NS = "http://purl.org/dc/elements/1.1/"
+NCX_NS = "http://www.daisy.org/z3986/2005/ncx/"
+XHTML_NS = "http://www.w3.org/1999/xhtml"
+OPS_NS = "http://www.idpf.org/2007/ops"
+
+NCX_MEDIA_TYPE = "application/x-dtbncx+xml"
+
+ISBN_RE = re.compile(r"(97[89])?\d{9}[\dX]", re.IGNORECASE)
+
+# Elements whose text never counts towards chapter word counts
+NON_TEXT_TAGS = {"script", "style", "head", "title"}
+
+# Elements that always separate words, even without whitespace between them
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "td", "th", "tr", "h1", "h2", "h3", "h4", "h5", "h6",
+    "blockquote", "section", "article", "aside", "header", "footer", "pre", "dt", "dd",
+}
+
+
+@dataclass
+class ManifestItem:
+    id: str
+    href: str
+    media_type: str
+    path: str  # Member name inside the archive
+    properties: str = ""
+
+
+@dataclass
+class TocEntry:
+    title: str
+    path: str  # Member name inside the archive
+    fragment: str = ""
+    children: List["TocEntry"] = field(default_factory=list)
+
+
+@dataclass
+class Package:
+    opf_path: str
+    metadata: Dict[str, object] = field(default_factory=dict)
+    items: Dict[str, ManifestItem] = field(default_factory=dict)
+    spine: List[str] = field(default_factory=list)
+    toc_id: Optional[str] = None
+    cover_id: Optional[str] = None
+
+    @property
+    def base_dir(self) -> str:
+        return posixpath.dirname(self.opf_path)
+
+    @property
+    def nav_item(self) -> Optional[ManifestItem]:
+        for item in self.items.values():
+            if "nav" in item.properties.split():
+                return item
+        return None
+
+    @property
+    def ncx_item(self) -> Optional[ManifestItem]:
+        if self.toc_id in self.items:
+            return self.items[self.toc_id]
+        for item in self.items.values():
+            if item.media_type == NCX_MEDIA_TYPE:
+                return item
+        return None
+
+    @property
+    def cover_item(self) -> Optional[ManifestItem]:
+        if self.cover_id in self.items:
+            return self.items[self.cover_id]
+        for item in self.items.values():
+            if "cover-image" in item.properties.split():
+                return item
+        return None
+
+
+def _local(tag) -> str:
+    if not isinstance(tag, str):
+        return ""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _text(elem) -> str:
+    return " ".join("".join(elem.itertext()).split())
+
+
+def _release(elem) -> None:
+    """Free an element and every already-processed sibling before it."""
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+
+def _iterparse(source: BinaryIO, events: Tuple[str, ...] = ("end",), **kwargs) -> Iterator:
+    # Book files are untrusted: never resolve entities or fetch DTDs
+    return etree.iterparse(
+        source,
+        events=events,
+        resolve_entities=False,
+        no_network=True,
+        load_dtd=False,
+        huge_tree=False,
+        **kwargs,
+    )
+
+
+def find_rootfile(archive: EpubArchive) -> str:
+    """Return the archive path of the package document from container.xml."""
+    if CONTAINER_PATH not in archive:
+        raise EpubError("Invalid EPUB: missing container.xml")
+
+    try:
+        with archive.open(CONTAINER_PATH) as container:
+            for _, elem in _iterparse(container, tag=f"{{{CONTAINER_NS}}}rootfile"):
+                full_path = elem.get("full-path")
+                media_type = elem.get("media-type", "application/oebps-package+xml")
+                if full_path and media_type == "application/oebps-package+xml":
+                    return resolve_href("", full_path)
+    except etree.XMLSyntaxError as e:
+        raise EpubError(f"Invalid EPUB: malformed container.xml: {e}") from e
+
+    raise EpubError("Invalid EPUB: container.xml has no rootfile")
+
+
+def parse_package(archive: EpubArchive) -> Package:
+    """Parse metadata, manifest and spine of the package document in one pass."""
+    package = Package(opf_path=find_rootfile(archive))
+    metadata = package.metadata
+    unique_id = None
+    identifiers: Dict[str, str] = {}
+
+    try:
+        with archive.open(package.opf_path) as opf:
+            for event, elem in _iterparse(opf, events=("start", "end")):
+                name = _local(elem.tag)
+
+                if event == "start":
+                    if name == "package":
+                        unique_id = elem.get("unique-identifier")
+                    continue
+
+                tag = elem.tag if isinstance(elem.tag, str) else ""
+                namespace = tag[1:].split("}", 1)[0] if tag.startswith("{") else ""
+
+                if namespace == DC_NS:
+                    value = _text(elem)
+                    if value:
+                        if name == "identifier":
+                            identifiers[elem.get("id") or f"_{len(identifiers)}"] = value
+                        elif name in ("creator", "contributor", "subject"):
+                            metadata.setdefault(f"{name}s", []).append(value)
+                        else:
+                            metadata.setdefault(name, value)
+
+                elif name == "meta" and elem.get("name") == "cover":
+                    package.cover_id = elem.get("content")
+
+                elif name == "item":
+                    item_id, href = elem.get("id"), elem.get("href")
+                    if item_id and href:
+                        package.items[item_id] = ManifestItem(
+                            id=item_id,
+                            href=href,
+                            media_type=elem.get("media-type", ""),
+                            path=resolve_href(package.base_dir, href),
+                            properties=elem.get("properties", ""),
+                        )
+                    _release(elem)
+
+                elif name == "itemref":
+                    idref = elem.get("idref")
+                    if idref and elem.get("linear", "yes") != "no":
+                        package.spine.append(idref)
+                    _release(elem)
+
+                elif name == "spine":
+                    package.toc_id = elem.get("toc")
+
+    except etree.XMLSyntaxError as e:
+        raise EpubError(f"Invalid EPUB: malformed package document: {e}") from e
+
+    # Spine entries pointing at undeclared items are skipped by readers too
+    package.spine = [idref for idref in package.spine if idref in package.items]
+
+    if identifiers:
+        metadata["identifier"] = identifiers.get(unique_id) or next(iter(identifiers.values()))
+        for value in identifiers.values():
+            digits = value.replace("-", "").replace(" ", "")
+            match = ISBN_RE.search(digits)
+            if match and ("isbn" in value.lower() or len(match.group(0)) == len(digits)):
+                metadata["isbn"] = match.group(0).upper()
+                break
+
+    return package
+
+
+def _split_target(base_dir: str, href: str) -> Tuple[str, str]:
+    path, _, fragment = href.partition("#")
+    return resolve_href(base_dir, path), fragment
+
+
+def _parse_ncx(archive: EpubArchive, item: ManifestItem) -> List[TocEntry]:
+    base_dir = posixpath.dirname(item.path)
+    root: List[TocEntry] = []
+    stack: List[List[TocEntry]] = [root]
+    labels: List[Optional[str]] = []
+    targets: List[Optional[Tuple[str, str]]] = []
+
+    with archive.open(item.path) as ncx:
+        for event, elem in _iterparse(ncx, events=("start", "end")):
+            name = _local(elem.tag)
+
+            if event == "start":
+                if name == "navPoint":
+                    labels.append(None)
+                    targets.append(None)
+                    stack.append([])
+                continue
+
+            if name == "text" and labels and labels[-1] is None:
+                labels[-1] = _text(elem)
+            elif name == "content" and targets and targets[-1] is None and elem.get("src"):
+                targets[-1] = _split_target(base_dir, elem.get("src"))
+            elif name == "navPoint":
+                children = stack.pop()
+                label, target = labels.pop(), targets.pop()
+                if target:
+                    stack[-1].append(TocEntry(label or "", target[0], target[1], children))
+                else:
+                    stack[-1].extend(children)
+                _release(elem)
+            elif name == "navMap":
+                break
+
+    return root
+
+
+def _parse_nav(archive: EpubArchive, item: ManifestItem) -> List[TocEntry]:
+    base_dir = posixpath.dirname(item.path)
+    root: List[TocEntry] = []
+    stack: List[List[TocEntry]] = [root]
+    pending: List[Optional[TocEntry]] = []
+    nav_depth = 0
+    toc_type = f"{{{OPS_NS}}}type"
+
+    with archive.open(item.path) as nav:
+        for event, elem in _iterparse(nav, events=("start", "end"), recover=True):
+            name = _local(elem.tag)
+
+            if name == "nav":
+                if event == "start" and (nav_depth or "toc" in elem.get(toc_type, "").split()):
+                    nav_depth += 1
+                elif event == "end" and nav_depth:
+                    nav_depth -= 1
+                    if not nav_depth:
+                        break
+                continue
+
+            if not nav_depth:
+                continue
+
+            if event == "start":
+                if name == "li":
+                    pending.append(None)
+                    stack.append([])
+                continue
+
+            if name in ("a", "span") and pending and pending[-1] is None:
+                href = elem.get("href")
+                path, fragment = _split_target(base_dir, href) if href else ("", "")
+                pending[-1] = TocEntry(_text(elem), path, fragment)
+            elif name == "li" and pending:
+                children = stack.pop()
+                entry = pending.pop()
+                if entry is not None and entry.path:
+                    entry.children = children
+                    stack[-1].append(entry)
+                else:
+                    stack[-1].extend(children)
+
+    return root
+
+
+def parse_toc(archive: EpubArchive, package: Package) -> List[TocEntry]:
+    """Parse the table of contents, preferring the EPUB 3 nav document."""
+    for item, parse in ((package.nav_item, _parse_nav), (package.ncx_item, _parse_ncx)):
+        if item is None or item.path not in archive:
+            continue
+        try:
+            toc = parse(archive, item)
+        except etree.XMLSyntaxError:
+            continue
+        if toc:
+            return toc
+    return []
+
+
+class WordCounter:
+    """lxml parser target that counts the words of a chapter as it streams.
+
+    Feed it through :meth:`feed` chunk by chunk while the chapter is being
+    written to disk; the counts are available after :meth:`close`. With a
+    ``text_limit``, the chapter's plain text (blocks separated by newlines)
+    is also kept, up to that many characters, in :attr:`text`.
+    """
+
+    def __init__(self, text_limit: int = 0):
+        self.words = 0
+        self._skip_depth = 0
+        self._in_word = False
+        self._text_limit = text_limit
+        self._text: List[str] = []
+        self._text_length = 0
+        self._parser = etree.HTMLParser(target=self, no_network=True, recover=True)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._text).strip()
+
+    def _collect(self, text: str) -> None:
+        remaining = self._text_limit - self._text_length
+        if remaining <= 0:
+            return
+        text = text[:remaining]
+        self._text.append(text)
+        self._text_length += len(text)
+
+    def feed(self, chunk: bytes) -> None:
+        self._parser.feed(chunk)
+
+    def close(self) -> int:
+        try:
+            self._parser.close()
+        except etree.XMLSyntaxError:
+            pass
+        return self.words
+
+    # Parser target interface
+
+    def start(self, tag, attrib) -> None:
+        name = _local(tag).lower()
+        if name in NON_TEXT_TAGS:
+            self._skip_depth += 1
+        elif name in BLOCK_TAGS:
+            self._in_word = False
+            self._collect("\n")
+
+    def end(self, tag) -> None:
+        name = _local(tag).lower()
+        if name in NON_TEXT_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif name in BLOCK_TAGS:
+            self._in_word = False
+            self._collect("\n")
+
+    def data(self, text: str) -> None:
+        if self._skip_depth or not text:
+            return
+        self._collect(text)
+        tokens = text.split()
+        if not tokens:
+            self._in_word = False
+            return
+        # A word split across two data callbacks is only counted once
+        continues = self._in_word and not text[0].isspace()
+        self.words += len(tokens) - (1 if continues else 0)
+        self._in_word = not text[-1].isspace()
+
+    def comment(self, text: str) -> None:
+        pass
+
+    def doctype(self, *args) -> None:
+        pass
+
+    def pi(self, *args) -> None:
+        pass
@@ -0,0 +1,136 @@
+"""Prometheus exporter of the Celery worker.
+
+Serves, on ``WORKER_METRICS_PORT`` of every worker (0 disables it):
+
+* run time and outcome of every task, from Celery's task signals
+* ingestion stage timings, EPUB bytes ingested and failures by task
+* the per-queue ingestion latency histograms kept in Redis by
+  ``worker.metrics``, which cover all workers and are read at scrape time;
+  only the worker with ``WORKER_EXPORT_QUEUE_METRICS`` set exports them,
+  so the series are not duplicated per worker
+
+Task metrics are per process; on the prefork pool set
+``PROMETHEUS_MULTIPROC_DIR`` so the exporter aggregates the children's.
+"""
+
+import logging
+import os
+import time
+from typing import Dict, Iterator
+
+from celery.signals import task_postrun, task_prerun, worker_init
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, start_http_server
+from prometheus_client.core import HistogramMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from redis.exceptions import RedisError
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9540"))
+
+# Whether this worker exports the queue histograms shared by all workers;
+# enable it on exactly one
+WORKER_EXPORT_QUEUE_METRICS = os.getenv("WORKER_EXPORT_QUEUE_METRICS", "true").strip().lower() in ("1", "true", "yes", "on")
+
+TASK_DURATION = Histogram(
+    "pixel_pages_task_duration_seconds",
+    "Run time of Celery tasks",
+    ["task", "outcome"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200),
+)
+
+TASK_FAILURES = Counter(
+    "pixel_pages_task_failures_total",
+    "Tasks that raised or returned an error status",
+    ["task"],
+)
+
+INGESTION_STAGE_DURATION = Histogram(
+    "pixel_pages_ingestion_stage_duration_seconds",
+    "Time spent in each stage of an ingestion",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+
+INGESTED_BYTES = Counter(
+    "pixel_pages_ingested_bytes_total",
+    "Bytes of EPUB files ingested successfully",
+)
+
+_started: Dict[str, float] = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, **kwargs) -> None:
+    _started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, retval=None, state=None, **kwargs) -> None:
+    started = _started.pop(task_id, None)
+    if started is None or task is None:
+        return
+
+    # Tasks report most failures as {"status": "error"} rather than raising
+    failed = state != "SUCCESS" or (isinstance(retval, dict) and retval.get("status") == "error")
+    TASK_DURATION.labels(task.name, "failure" if failed else "success").observe(time.perf_counter() - started)
+    if failed:
+        TASK_FAILURES.labels(task.name).inc()
+
+
+def observe_ingestion(timings: Dict[str, float], epub_bytes: int) -> None:
+    """Record the stage timings and size of a successful ingestion."""
+    for stage, seconds in timings.items():
+        if stage != "total":
+            INGESTION_STAGE_DURATION.labels(stage).observe(seconds)
+    INGESTED_BYTES.inc(epub_bytes)
+
+
+class QueueLatencyCollector:
+    """Exposes the Redis-backed ingestion queue histograms."""
+
+    def collect(self) -> Iterator[HistogramMetricFamily]:
+        try:
+            report = metrics.report()
+        except RedisError:
+            logger.warning("Could not read ingestion queue histograms", exc_info=True)
+            return
+
+        for metric in metrics.METRICS:
+            family = HistogramMetricFamily(
+                f"pixel_pages_ingestion_{metric}",
+                f"Ingestion {metric.replace('_', ' ')} per queue, across all workers",
+                labels=["queue"],
+            )
+            for queue, histograms in report.items():
+                snapshot = histograms[metric]
+                buckets = [
+                    ("+Inf" if bound == "inf" else bound, count)
+                    for bound, count in snapshot["buckets"].items()
+                ]
+                family.add_metric([queue], buckets, snapshot["sum"])
+            yield family
+
+
+def start_exporter(port: int = WORKER_METRICS_PORT) -> None:
+    """Serve the worker's metrics over HTTP on ``port``."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    if WORKER_EXPORT_QUEUE_METRICS:
+        registry.register(QueueLatencyCollector())
+
+    try:
+        start_http_server(port, registry=registry)
+    except OSError:
+        logger.warning("Could not serve worker metrics on port %d", port, exc_info=True)
+
+
+@worker_init.connect
+def _on_worker_init(**kwargs) -> None:
+    if WORKER_METRICS_PORT:
+        start_exporter()
@@ -0,0 +1,235 @@
+"""EPUB ingestion pipeline.
+
+Manifest items are streamed one archive member at a time from the uploaded
+EPUB into their final location under ``storage/books/{book_id}``; nothing is
+extracted to a temporary directory first. Images, fonts and stylesheets go
+to the shared content-addressed blob store, so assets already stored for
+another book are linked instead of written again. Stored chapters and
+stylesheets are then normalized and precompressed in parallel (see
+:mod:`worker.epub.normalizer`), and raster images get WebP renditions (see
+:mod:`worker.epub.images`).
+"""
+
+import json
+import os
+import posixpath
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set
+
+from .epub.archive import EpubArchive
+from .epub.images import RASTER_MEDIA_TYPES, ImageJob, render_images
+from .epub.manifest import build_manifest
+from .epub.normalizer import NORMALIZE_WORKERS, NormalizeJob, normalize_documents
+from .epub.parser import ManifestItem, Package, WordCounter, parse_package, parse_toc
+from .storage import book_dir, intern_file, store_blob, write_stream
+
+# Characters of plain text kept per chapter for the search index
+SEARCH_TEXT_LIMIT = int(os.getenv("SEARCH_TEXT_LIMIT", "200000"))
+
+CHAPTER_MEDIA_TYPES = {"application/xhtml+xml", "text/html"}
+FONT_MEDIA_TYPES = {
+    "application/vnd.ms-opentype",
+    "application/font-sfnt",
+    "application/font-woff",
+    "application/x-font-ttf",
+    "application/x-font-otf",
+    "application/x-font-truetype",
+    "application/x-font-opentype",
+}
+
+
+def asset_category(media_type: str) -> Optional[str]:
+    """Map a manifest media type to its directory in book storage."""
+    media_type = media_type.lower()
+    if media_type in CHAPTER_MEDIA_TYPES:
+        return "chapters"
+    if media_type.startswith("image/"):
+        return "images"
+    if media_type.startswith("font/") or media_type in FONT_MEDIA_TYPES:
+        return "fonts"
+    if media_type == "text/css":
+        return "css"
+    return None
+
+
+def storage_path(item: ManifestItem, category: str, taken: Set[str]) -> str:
+    """Return a unique path for a manifest item relative to the book directory.
+
+    Items are flattened into their category directory; clashing file names
+    get a numeric suffix.
+    """
+    name = posixpath.basename(item.path)
+    stem, ext = posixpath.splitext(name)
+    relative = posixpath.join(category, name)
+
+    counter = 1
+    while relative in taken:
+        relative = posixpath.join(category, f"{stem}-{counter}{ext}")
+        counter += 1
+
+    taken.add(relative)
+    return relative
+
+
+@dataclass
+class IngestionResult:
+    manifest: dict
+    timings: Dict[str, float] = field(default_factory=dict)  # Seconds per stage
+    normalize_workers: int = 1
+    deduplicated: int = 0  # Assets linked to blobs that were already stored
+    # Plain text of the spine chapters: index, path and text of each
+    chapter_texts: List[dict] = field(default_factory=list)
+
+
+def _normalize_jobs(package: Package, assets: Dict[str, dict], destination: Path) -> List[NormalizeJob]:
+    """Build normalization jobs, spine chapters first and in reading order."""
+    order = list(dict.fromkeys(package.spine + list(assets)))
+    jobs = []
+
+    for item_id in order:
+        asset = assets.get(item_id)
+        if asset is None or asset["category"] not in ("chapters", "css"):
+            continue
+        item = package.items[item_id]
+        jobs.append(NormalizeJob(
+            file=str(destination / asset["path"]),
+            archive_path=item.path,
+            storage_path=asset["path"],
+            media_type=item.media_type.lower(),
+        ))
+
+    return jobs
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+
+def ingest_epub(
+    epub_path: Path,
+    book_id: str,
+    progress: Optional[Callable[..., None]] = None,
+    deadline: Optional[float] = None,
+) -> IngestionResult:
+    """Stream an EPUB into book storage, normalize it and write manifest.json.
+
+    Args:
+        epub_path: Path to the uploaded EPUB file
+        book_id: UUID of the book record
+        progress: Called with a stage name and ``done``/``total`` counts as
+            ingestion advances (see :class:`worker.progress.ProgressReporter`)
+        deadline: ``time.monotonic()`` time by which work running on the
+            normalize and image pools must be done
+
+    Raises:
+        TimeoutError: If pooled work is still running at ``deadline``
+
+    Returns:
+        IngestionResult: The manifest written for the reader and stage timings
+    """
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    report = progress or (lambda stage, **fields: None)
+
+    destination = book_dir(book_id)
+    destination.mkdir(parents=True, exist_ok=True)
+
+    assets: Dict[str, dict] = {}
+    texts: Dict[str, str] = {}
+    deduplicated = 0
+
+    with EpubArchive(epub_path) as archive:
+        package = parse_package(archive)
+        toc = parse_toc(archive, package)
+        timings["parse"] = time.perf_counter() - started
+        report("parsed", title=package.metadata.get("title"), chapters=len(package.spine), items=len(package.items))
+
+        taken: Set[str] = set()
+        for done, item in enumerate(package.items.values(), start=1):
+            report("extract", done=done, total=len(package.items))
+            category = asset_category(item.media_type)
+            if category is None or item.path not in archive:
+                continue
+
+            relative = storage_path(item, category, taken)
+            asset = assets[item.id] = {"path": relative, "category": category}
+
+            if category in ("images", "fonts"):
+                info = archive.info(item.path)
+                digest, size, reused = store_blob(
+                    partial(archive.open, item.path),
+                    destination / relative,
+                    hint=f"{info.CRC:08x}-{info.file_size}",
+                )
+                asset.update(bytes=size, sha256=digest)
+                deduplicated += reused
+                continue
+
+            counter = WordCounter(SEARCH_TEXT_LIMIT) if category == "chapters" else None
+            with archive.open(item.path) as member:
+                asset["bytes"] = write_stream(
+                    member,
+                    destination / relative,
+                    on_chunk=counter.feed if counter is not None else None,
+                )
+            if counter is not None:
+                asset["words"] = counter.close()
+                texts[relative] = counter.text
+
+        timings["extract"] = time.perf_counter() - started - timings["parse"]
+
+    stage_started = time.perf_counter()
+    links = {package.items[item_id].path: asset["path"] for item_id, asset in assets.items()}
+    jobs = _normalize_jobs(package, assets, destination)
+    by_path = {asset["path"]: asset for asset in assets.values()}
+
+    for done, normalized in enumerate(normalize_documents(jobs, links, _remaining(deadline)), start=1):
+        report("chapters", done=done, total=len(jobs))
+        asset = by_path[normalized["path"]]
+        asset.update(bytes=normalized["bytes"], sha256=normalized["sha256"], encodings=normalized["encodings"])
+
+        # Stylesheets are only final once their links are rewritten
+        if asset["category"] == "css":
+            _, reused = intern_file(destination / asset["path"])
+            deduplicated += reused
+    timings["normalize"] = time.perf_counter() - stage_started
+
+    stage_started = time.perf_counter()
+    cover = package.cover_item
+    image_jobs = [
+        ImageJob(
+            file=str(destination / asset["path"]),
+            storage_path=asset["path"],
+            sha256=asset["sha256"],
+            thumbnail=cover is not None and item_id == cover.id,
+        )
+        for item_id, asset in assets.items()
+        if asset["category"] == "images" and package.items[item_id].media_type.lower() in RASTER_MEDIA_TYPES
+    ]
+
+    for done, (job, rendered) in enumerate(zip(image_jobs, render_images(image_jobs, destination, _remaining(deadline))), start=1):
+        report("images", done=done, total=len(image_jobs))
+        if rendered is not None:
+            by_path[job.storage_path].update(rendered)
+    timings["images"] = time.perf_counter() - stage_started
+
+    manifest = build_manifest(book_id, package, toc, assets)
+
+    with open(destination / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    timings["total"] = time.perf_counter() - started
+
+    return IngestionResult(
+        manifest=manifest,
+        timings={stage: round(seconds, 4) for stage, seconds in timings.items()},
+        normalize_workers=NORMALIZE_WORKERS if len(jobs) > 1 else 1,
+        deduplicated=deduplicated,
+        chapter_texts=[
+            {"index": chapter["index"], "path": chapter["path"], "text": texts.get(chapter["path"], "")}
+            for chapter in manifest["chapters"]
+        ],
+    )
@@ -0,0 +1,383 @@
+"""Incremental storage janitor.
+
+Reclaims what the normal request and task paths leave behind:
+
+* ``books``: book directories whose ``books`` row was deleted, or whose
+  book is still unprocessed ``UPLOAD_STALE_SECONDS`` after its upload (a
+  failed ingestion, which is never retried), together with the blobs only
+  they referenced
+* ``uploads``: completed uploads no book still in ingestion is waiting
+  for, and resumable uploads abandoned for ``UPLOAD_STALE_SECONDS``
+* ``temp``: temporary files older than ``TEMP_MAX_AGE_SECONDS``
+* ``blobs``: blobs no book links to any more, and leftover staging links
+
+Each run visits the next ``max_entries`` entries with ``os.scandir`` and
+stores its cursor in Redis, so a cycle over millions of files is spread
+over many short runs, and neither a run nor the cursor ever holds a
+directory listing. Book and user upload directories count as one entry
+each; under ``temp`` and ``blobs`` every file and directory counts, and
+the cursor holds the position at every level of the tree it stopped in
+(such as shard, prefix and blob). Book and owner ids are checked against
+Postgres ``batch_size`` at a time with ``= ANY(...)``.
+
+Positions count entries in directory order. Entries added or removed
+between runs can shift that order; anything skipped because of it is
+picked up in the next cycle. Nothing younger than ``JANITOR_GRACE_SECONDS``
+is touched, so files of an upload or ingestion in progress are safe.
+"""
+
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from . import db
+from .reading_progress import RELEASE_LOCK_SCRIPT
+from .redis_client import get_redis
+from .storage import BLOBS_DIR, BLOBS_TMP_DIR, BOOKS_DIR, TEMP_DIR, UPLOADS_DIR, delete_book
+
+STATE_KEY = "pixel_pages:janitor:state"
+LOCK_KEY = "pixel_pages:janitor:lock"
+
+# Entries younger than this are never removed
+JANITOR_GRACE_SECONDS = int(os.getenv("JANITOR_GRACE_SECONDS", "3600"))
+
+# Resumable uploads without a new chunk for this long are abandoned, as are
+# books still unprocessed this long after they were created
+UPLOAD_STALE_SECONDS = int(os.getenv("UPLOAD_STALE_SECONDS", str(24 * 3600)))
+
+# Temporary files are removed after this long
+TEMP_MAX_AGE_SECONDS = int(os.getenv("TEMP_MAX_AGE_SECONDS", str(24 * 3600)))
+
+Stats = Dict[str, int]
+
+# Position in each directory level a phase stopped in, outermost first
+Cursor = List[int]
+
+# Entries visited, and where to resume, or None once the phase is done
+PhaseResult = Tuple[int, Optional[Cursor]]
+
+
+def _new_stats() -> Stats:
+    return {
+        "scanned": 0,
+        "books_removed": 0,
+        "uploads_removed": 0,
+        "temp_files_removed": 0,
+        "blobs_removed": 0,
+        "directories_removed": 0,
+        "reclaimed_bytes": 0,
+    }
+
+
+def _scan(directory: Path, position: int = 0, limit: Optional[int] = None) -> Iterator[os.DirEntry]:
+    """Yield up to ``limit`` entries of a directory, skipping ``position``."""
+    try:
+        with os.scandir(directory) as entries:
+            yield from islice(entries, position, None if limit is None else position + limit)
+    except FileNotFoundError:
+        return
+
+
+def _resume(cursor: Cursor) -> Tuple[int, Cursor]:
+    """Position in the current directory, and the cursor below it."""
+    return (cursor[0], cursor[1:]) if cursor else (0, [])
+
+
+def _next_position(position: int, scanned: int, limit: int) -> Optional[Cursor]:
+    # A top-level scan that stopped short of its limit reached the end
+    return [position + scanned] if scanned >= limit else None
+
+
+def _age(entry: os.DirEntry, now: float) -> float:
+    try:
+        return now - entry.stat(follow_symlinks=False).st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _remove_empty_dir(path: str, stats: Stats) -> None:
+    """Remove a directory if it is empty; it is left alone otherwise."""
+    try:
+        os.rmdir(path)
+        stats["directories_removed"] += 1
+    except OSError:
+        pass
+
+
+def _unlink(path: str) -> int:
+    try:
+        stat = os.stat(path, follow_symlinks=False)
+        os.unlink(path)
+    except FileNotFoundError:
+        return 0
+    return stat.st_size if stat.st_nlink == 1 else 0
+
+
+def _abandoned_before(now: float) -> datetime:
+    """Creation time before which an unprocessed book will never be processed."""
+    return datetime.fromtimestamp(now - UPLOAD_STALE_SECONDS, tz=timezone.utc)
+
+
+def _reap_books(entries: List[os.DirEntry], stats: Stats, now: float) -> None:
+    live = db.run(db.live_book_ids([entry.name for entry in entries], _abandoned_before(now)))
+    for entry in entries:
+        if entry.name in live or _age(entry, now) < JANITOR_GRACE_SECONDS:
+            continue
+        stats["reclaimed_bytes"] += delete_book(entry.name)
+        stats["books_removed"] += 1
+
+
+def clean_books(cursor: Cursor, limit: int, batch_size: int, stats: Stats) -> PhaseResult:
+    """Remove book directories without a books row or of failed ingestions."""
+    now = time.time()
+    position, _ = _resume(cursor)
+    scanned = 0
+    batch: List[os.DirEntry] = []
+
+    for entry in _scan(BOOKS_DIR, position, limit):
+        scanned += 1
+        try:
+            uuid.UUID(entry.name)
+        except ValueError:
+            continue
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            _reap_books(batch, stats, now)
+            batch = []
+
+    if batch:
+        _reap_books(batch, stats, now)
+    return scanned, _next_position(position, scanned, limit)
+
+
+def _upload_id(name: str) -> Optional[str]:
+    for suffix in (".epub.part", ".epub", ".json"):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return None
+
+
+def _reap_user_uploads(directory: os.DirEntry, pending: Set[str], stats: Stats, now: float) -> None:
+    # One user's unfinished uploads: few enough to group in memory
+    uploads: Dict[str, List[Tuple[str, float]]] = {}
+    for entry in _scan(Path(directory.path)):
+        upload_id = _upload_id(entry.name)
+        if upload_id is not None and entry.is_file(follow_symlinks=False):
+            uploads.setdefault(upload_id, []).append((entry.name, _age(entry, now)))
+
+    for upload_id, files in uploads.items():
+        youngest = min(age for _, age in files)
+        completed = f"{upload_id}.epub" in {name for name, _ in files}
+        if completed:
+            # Awaited by a book in ingestion, or about to be registered
+            if f"{upload_id}.epub" in pending or youngest < JANITOR_GRACE_SECONDS:
+                continue
+        elif youngest < UPLOAD_STALE_SECONDS:
+            continue
+
+        for name, _ in files:
+            stats["reclaimed_bytes"] += _unlink(os.path.join(directory.path, name))
+        stats["uploads_removed"] += 1
+
+    if _age(directory, now) >= JANITOR_GRACE_SECONDS:
+        _remove_empty_dir(directory.path, stats)
+
+
+def _reap_uploads(directories: List[os.DirEntry], stats: Stats, now: float) -> None:
+    pending = db.run(db.pending_upload_paths([entry.name for entry in directories], _abandoned_before(now)))
+    for directory in directories:
+        _reap_user_uploads(directory, pending.get(directory.name, set()), stats, now)
+
+
+def clean_uploads(cursor: Cursor, limit: int, batch_size: int, stats: Stats) -> PhaseResult:
+    """Remove orphaned and abandoned uploads, one user directory per entry."""
+    now = time.time()
+    position, _ = _resume(cursor)
+    scanned = 0
+    batch: List[os.DirEntry] = []
+
+    for entry in _scan(UPLOADS_DIR / "users", position, limit):
+        scanned += 1
+        try:
+            uuid.UUID(entry.name)
+        except ValueError:
+            continue
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            _reap_uploads(batch, stats, now)
+            batch = []
+
+    if batch:
+        _reap_uploads(batch, stats, now)
+    return scanned, _next_position(position, scanned, limit)
+
+
+def _walk(
+    directory: Path,
+    cursor: Cursor,
+    budget: int,
+    descend: Callable[[os.DirEntry, int], bool],
+    visit: Callable[[os.DirEntry, int], None],
+    depth: int = 0,
+) -> PhaseResult:
+    """Visit the entries under a directory depth-first, resuming at ``cursor``.
+
+    Every file and every directory counts as one entry against ``budget``.
+    Directories ``descend`` accepts are visited after their children, so
+    ``visit`` can remove them once emptied; finishing them can take the
+    count past ``budget`` by at most the depth of the tree.
+    """
+    position, inner = _resume(cursor)
+    scanned = 0
+
+    for entry in _scan(directory, position):
+        if scanned >= budget:
+            return scanned, [position]
+        if descend(entry, depth):
+            count, resume_at = _walk(Path(entry.path), inner, budget - scanned, descend, visit, depth + 1)
+            scanned += count
+            if resume_at is not None:
+                return scanned, [position] + resume_at
+        # Only the entry the cursor stopped in resumes part way
+        inner = []
+        visit(entry, depth)
+        scanned += 1
+        position += 1
+
+    return scanned, None
+
+
+def clean_temp(cursor: Cursor, limit: int, batch_size: int, stats: Stats) -> PhaseResult:
+    """Remove old temporary files and the directories they leave empty."""
+    now = time.time()
+
+    def descend(entry: os.DirEntry, depth: int) -> bool:
+        return entry.is_dir(follow_symlinks=False)
+
+    def visit(entry: os.DirEntry, depth: int) -> None:
+        if _age(entry, now) < TEMP_MAX_AGE_SECONDS:
+            return
+        if entry.is_dir(follow_symlinks=False):
+            _remove_empty_dir(entry.path, stats)
+        else:
+            stats["reclaimed_bytes"] += _unlink(entry.path)
+            stats["temp_files_removed"] += 1
+
+    return _walk(TEMP_DIR, cursor, limit, descend, visit)
+
+
+def clean_blobs(cursor: Cursor, limit: int, batch_size: int, stats: Stats) -> PhaseResult:
+    """Remove unreferenced blobs from ``blobs/{aa}/{bb}`` and stale staging links."""
+    now = time.time()
+    staging = str(BLOBS_TMP_DIR)
+
+    def descend(entry: os.DirEntry, depth: int) -> bool:
+        if depth == 0 and entry.path == staging:
+            return True
+        return depth < 2 and len(entry.name) == 2 and entry.is_dir(follow_symlinks=False)
+
+    def visit(entry: os.DirEntry, depth: int) -> None:
+        if depth == 1 and os.path.dirname(entry.path) == staging:
+            # Staging link of an interrupted ingestion
+            if _age(entry, now) >= JANITOR_GRACE_SECONDS:
+                stats["reclaimed_bytes"] += _unlink(entry.path)
+            return
+        if depth != 2:
+            return
+
+        try:
+            stat = entry.stat(follow_symlinks=False)
+        except FileNotFoundError:
+            return
+        if stat.st_nlink == 1 and now - stat.st_mtime >= JANITOR_GRACE_SECONDS:
+            os.unlink(entry.path)
+            stats["reclaimed_bytes"] += stat.st_size
+            stats["blobs_removed"] += 1
+
+    return _walk(BLOBS_DIR, cursor, limit, descend, visit)
+
+
+# Orphaned books first, so the blobs they release are collected in the
+# same cycle
+PHASES: Dict[str, Callable[[Cursor, int, int, Stats], PhaseResult]] = {
+    "books": clean_books,
+    "uploads": clean_uploads,
+    "temp": clean_temp,
+    "blobs": clean_blobs,
+}
+
+
+def _load_state(redis) -> Tuple[int, Cursor]:
+    try:
+        state = json.loads(redis.get(STATE_KEY) or "{}")
+        phase = int(state.get("phase", 0)) % len(PHASES)
+        # States saved before cursors went below the top level hold "position"
+        cursor = state.get("cursor", [state.get("position", 0)])
+        return phase, [max(int(position), 0) for position in cursor]
+    except (TypeError, ValueError):
+        return 0, []
+
+
+def _save_state(redis, phase: int, cursor: Cursor) -> None:
+    redis.set(STATE_KEY, json.dumps({"phase": phase, "cursor": cursor}))
+
+
+def run_janitor(max_entries: int, batch_size: int, lock_seconds: int) -> Dict[str, int]:
+    """Continue the storage janitor's cycle for up to ``max_entries`` entries.
+
+    Args:
+        max_entries: Entries visited per run: book directories, user upload
+            directories, and every temporary file, blob and directory
+            under ``temp`` and ``blobs``
+        batch_size: Ids checked against the database per query
+        lock_seconds: Expiry of the lock that keeps runs from overlapping
+
+    Returns:
+        Dict[str, int]: Entries scanned, what was removed, bytes reclaimed
+        and whether this run completed a cycle
+    """
+    redis = get_redis()
+    token = uuid.uuid4().hex
+    stats = _new_stats()
+    stats["cycle_completed"] = 0
+    stats["skipped"] = 0
+
+    if not redis.set(LOCK_KEY, token, nx=True, ex=lock_seconds):
+        stats["skipped"] = 1
+        return stats
+
+    try:
+        phase, cursor = _load_state(redis)
+        names = list(PHASES)
+        remaining = max_entries
+
+        while remaining > 0:
+            scanned, resume_at = PHASES[names[phase]](cursor, remaining, batch_size, stats)
+            stats["scanned"] += scanned
+            remaining -= scanned
+
+            if resume_at is None:
+                # The phase ran out of entries
+                phase, cursor = (phase + 1) % len(names), []
+                if phase == 0:
+                    stats["cycle_completed"] = 1
+                    break
+            else:
+                cursor = resume_at
+
+            # Saved as it goes, so a crash only repeats the current batch
+            _save_state(redis, phase, cursor)
+
+        _save_state(redis, phase, cursor)
+        return stats
+    finally:
+        redis.eval(RELEASE_LOCK_SCRIPT, 1, LOCK_KEY, token)
@@ -2,10 +2,25 @@
 
 import os
 from celery import Celery
+from kombu import Queue
+
+# Seconds between expired refresh token purges
+TOKEN_PURGE_INTERVAL = float(os.getenv("TOKEN_PURGE_INTERVAL", "900"))
+
+# Seconds between storage janitor runs
+JANITOR_INTERVAL = float(os.getenv("JANITOR_INTERVAL", "300"))
+
+# Seconds between flushes of buffered reading progress
+READING_PROGRESS_FLUSH_INTERVAL = float(os.getenv("READING_PROGRESS_FLUSH_INTERVAL", "5"))
 
 # Redis URL
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+# Seconds before Redis redelivers an unacknowledged task. Ingestion acks
+# late, so this must exceed the longest ingestion time limit, or running
+# books would be handed to a second worker.
+BROKER_VISIBILITY_TIMEOUT = int(os.getenv("BROKER_VISIBILITY_TIMEOUT", "3600"))
+
 # Create Celery app
 app = Celery(
     "pixel_pages_worker",
@@ -22,6 +37,45 @@ app.conf.update(
     timezone="UTC",
     enable_utc=True,
     result_expires=3600,
+    # Maintenance tasks use the default queue; the API routes process_epub
+    # to an ingestion queue by file size (see api.celery_app). Run separate
+    # workers so small books keep their own slots:
+    #   -Q celery,ingest.small         and   -Q ingest.large,ingest.bulk
+    task_default_queue="celery",
+    task_queues=(
+        Queue("celery"),
+        Queue("ingest.small"),
+        Queue("ingest.large"),
+        Queue("ingest.bulk"),
+    ),
+    # Priorities must match the API's; queues are consumed in the order a
+    # worker lists them, so a worker drains ingest.large before ingest.bulk
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+        "visibility_timeout": BROKER_VISIBILITY_TIMEOUT,
+    },
+    # One reserved task per slot: a prefetched small book would otherwise
+    # wait behind the long book its slot is running
+    worker_prefetch_multiplier=1,
+    beat_schedule={
+        "purge-expired-refresh-tokens": {
+            "task": "purge_expired_tokens",
+            "schedule": TOKEN_PURGE_INTERVAL,
+        },
+        "storage-janitor": {
+            "task": "storage_janitor",
+            "schedule": JANITOR_INTERVAL,
+            "options": {"expires": JANITOR_INTERVAL},
+        },
+        "flush-reading-progress": {
+            "task": "flush_reading_progress",
+            "schedule": READING_PROGRESS_FLUSH_INTERVAL,
+            # A missed flush is covered by the next one
+            "options": {"expires": READING_PROGRESS_FLUSH_INTERVAL},
+        },
+    },
 )
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+"""Ingestion latency histograms kept in Redis.
+
+Every ``process_epub`` run records, per queue, how long the task waited in
+the queue, how long it ran, and the time to readable (upload completed to
+book processed, the sum of both). Each histogram is a Redis hash of
+cumulative bucket counters plus ``count`` and ``sum``, the layout of a
+Prometheus histogram, so all worker processes add to the same series and
+quantiles can be estimated from any of them:
+
+    python -m worker.metrics
+"""
+
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from redis.exceptions import RedisError
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; the last bucket is +Inf
+BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1200)
+
+METRICS = ("queue_wait_seconds", "run_seconds", "time_to_readable_seconds")
+
+QUEUES = ("ingest.small", "ingest.large", "ingest.bulk")
+
+
+def histogram_key(metric: str, queue: str) -> str:
+    return f"pixel_pages:metrics:{metric}:{queue}"
+
+
+def _bucket_fields(value: float) -> List[str]:
+    return [str(bound) for bound in BUCKETS if value <= bound] + ["+Inf"]
+
+
+def observe(queue: str, values: Dict[str, float]) -> None:
+    """Add one observation per metric to the histograms of a queue."""
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for metric, value in values.items():
+            key = histogram_key(metric, queue)
+            for field in _bucket_fields(value):
+                pipe.hincrby(key, field, 1)
+            pipe.hincrby(key, "count", 1)
+            pipe.hincrbyfloat(key, "sum", value)
+        pipe.execute()
+    except RedisError:
+        logger.warning("Could not record ingestion metrics of %s", queue, exc_info=True)
+
+
+def _quantile(q: float, buckets: List[tuple], count: int) -> Optional[float]:
+    """Estimate a quantile by linear interpolation within its bucket."""
+    if not count:
+        return None
+    rank = q * count
+    lower, below = 0.0, 0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if bound == float("inf"):
+                return lower
+            inside = cumulative - below
+            return lower + (bound - lower) * ((rank - below) / inside if inside else 1.0)
+        lower, below = bound, cumulative
+    return lower
+
+
+def snapshot(metric: str, queue: str, quantiles: Iterable[float] = (0.5, 0.95, 0.99)) -> dict:
+    """Counts of a histogram with its estimated quantiles."""
+    raw = {key.decode(): value.decode() for key, value in get_redis().hgetall(histogram_key(metric, queue)).items()}
+    count = int(raw.get("count", 0))
+    buckets = [(float(bound), int(raw.get(str(bound), 0))) for bound in BUCKETS]
+    buckets.append((float("inf"), int(raw.get("+Inf", 0))))
+
+    return {
+        "count": count,
+        "sum": float(raw.get("sum", 0.0)),
+        "buckets": {str(bound): cumulative for bound, cumulative in buckets},
+        **{f"p{round(q * 100)}": _quantile(q, buckets, count) for q in quantiles},
+    }
+
+
+def report() -> Dict[str, Dict[str, dict]]:
+    """Snapshots of every ingestion histogram, by queue and metric."""
+    return {queue: {metric: snapshot(metric, queue) for metric in METRICS} for queue in QUEUES}
+
+
+if __name__ == "__main__":
+    print(json.dumps(report(), indent=2))
@@ -0,0 +1,81 @@
+"""Ingestion progress events published over Redis.
+
+Every event is published as JSON on ``pixel_pages:books:{book_id}:progress``
+and also stored under the same name with a ``:last`` suffix, so clients
+that subscribe mid-ingestion start from the current stage. The API relays
+these events to browsers over Server-Sent Events.
+
+Events carry ``published_at`` (epoch seconds) so the delivery latency to
+subscribers can be measured. Publishing never fails a task; a Redis outage
+only costs the live updates.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from celery.exceptions import SoftTimeLimitExceeded
+from redis.exceptions import RedisError
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Seconds the last event of a book is kept for late subscribers
+PROGRESS_EVENT_TTL = int(os.getenv("PROGRESS_EVENT_TTL", "3600"))
+
+# Minimum seconds between two intermediate events of one stage
+PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", "0.2"))
+
+
+def progress_channel(book_id: str) -> str:
+    return f"pixel_pages:books:{book_id}:progress"
+
+
+def publish_progress(book_id: str, stage: str, **fields) -> None:
+    """Publish one progress event of a book."""
+    channel = progress_channel(book_id)
+    event = json.dumps({"book_id": book_id, "stage": stage, "published_at": time.time(), **fields})
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.publish(channel, event)
+        pipe.set(f"{channel}:last", event, ex=PROGRESS_EVENT_TTL)
+        pipe.execute()
+    except RedisError:
+        logger.warning("Could not publish %s progress of book %s", stage, book_id, exc_info=True)
+
+
+class ProgressReporter:
+    """Publishes the progress of one ingestion, throttling per-item updates.
+
+    Stage changes are always published; ``done``/``total`` updates within a
+    stage at most every ``PROGRESS_MIN_INTERVAL`` seconds, plus the last one.
+
+    As every step of an ingestion reports here, the reporter also enforces
+    the soft time limit (a ``time.monotonic()`` deadline) where Celery does
+    not, such as on the threads pool.
+    """
+
+    def __init__(self, book_id: str, deadline: Optional[float] = None):
+        self.book_id = book_id
+        self.deadline = deadline
+        self._stage: Optional[str] = None
+        self._last_published = 0.0
+
+    def __call__(self, stage: str, **fields) -> None:
+        now = time.monotonic()
+        if self.deadline is not None and now > self.deadline:
+            raise SoftTimeLimitExceeded()
+
+        done, total = fields.get("done"), fields.get("total")
+        finished = done is None or done == total
+
+        if stage == self._stage and not finished and now - self._last_published < PROGRESS_MIN_INTERVAL:
+            return
+
+        self._stage = stage
+        self._last_published = now
+        publish_progress(self.book_id, stage, **fields)
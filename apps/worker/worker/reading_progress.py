@@ -0,0 +1,100 @@
+"""Flushing buffered reading positions to Postgres.
+
+The API coalesces reading positions in a Redis hash (newest position per
+user and book, see ``api.reading_progress``). Each flush renames that hash
+to a flushing key, so new updates keep landing in a fresh buffer, and
+upserts its entries in batches of one statement each. The flushing key is
+only deleted once every batch is written; a failed flush is retried as is
+by the next run.
+"""
+
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from redis.exceptions import ResponseError
+
+from . import db
+from .redis_client import get_redis
+
+# Must match the keys used by the API
+PENDING_KEY = "pixel_pages:reading_progress:pending"
+FLUSHING_KEY = "pixel_pages:reading_progress:flushing"
+FLUSH_LOCK_KEY = "pixel_pages:reading_progress:flush_lock"
+
+# Releases the lock only if this flush still holds it
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _parse(field: bytes, value: bytes) -> Optional[dict]:
+    try:
+        user_id, book_id = field.decode().split(":", 1)
+        ts, percent, cfi = value.decode().split("\t", 2)
+        return {
+            "user_id": uuid.UUID(user_id),
+            "book_id": uuid.UUID(book_id),
+            "cfi": cfi,
+            "percent": float(percent),
+            "client_updated_at": datetime.fromtimestamp(float(ts), timezone.utc),
+        }
+    except (UnicodeDecodeError, ValueError):
+        return None
+
+
+async def _write_batches(batches: List[List[dict]]) -> int:
+    written = 0
+    for rows in batches:
+        written += await db.upsert_reading_progress(rows)
+    return written
+
+
+def flush_reading_progress(batch_size: int, lock_seconds: int) -> Dict[str, int]:
+    """Move buffered reading positions from Redis to Postgres.
+
+    Args:
+        batch_size: Positions written per statement
+        lock_seconds: Expiry of the lock that keeps flushes from overlapping
+
+    Returns:
+        Dict[str, int]: Positions flushed, rows written and statements run
+    """
+    redis = get_redis()
+    token = uuid.uuid4().hex
+    stats = {"positions": 0, "written": 0, "batches": 0, "skipped": 0}
+
+    if not redis.set(FLUSH_LOCK_KEY, token, nx=True, ex=lock_seconds):
+        stats["skipped"] = 1
+        return stats
+
+    try:
+        # A leftover flushing key means the previous flush failed; retry it first
+        if not redis.exists(FLUSHING_KEY):
+            try:
+                redis.rename(PENDING_KEY, FLUSHING_KEY)
+            except ResponseError:
+                return stats  # Nothing buffered
+
+        batches: List[List[dict]] = [[]]
+        for field, value in redis.hscan_iter(FLUSHING_KEY, count=batch_size):
+            row = _parse(field, value)
+            if row is None:
+                continue
+            if len(batches[-1]) >= batch_size:
+                batches.append([])
+            batches[-1].append(row)
+        batches = [rows for rows in batches if rows]
+
+        stats["positions"] = sum(len(rows) for rows in batches)
+        stats["batches"] = len(batches)
+        if batches:
+            stats["written"] = db.run(_write_batches(batches))
+
+        redis.delete(FLUSHING_KEY)
+        return stats
+    finally:
+        redis.eval(RELEASE_LOCK_SCRIPT, 1, FLUSH_LOCK_KEY, token)
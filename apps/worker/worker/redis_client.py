@@ -0,0 +1,21 @@
+"""Shared Redis connection for worker tasks."""
+
+import os
+import threading
+from typing import Optional
+
+from redis import Redis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_redis: Optional[Redis] = None
+_redis_lock = threading.Lock()
+
+
+def get_redis() -> Redis:
+    """Return the process-wide Redis client, creating it on first use."""
+    global _redis
+    with _redis_lock:
+        if _redis is None:
+            _redis = Redis.from_url(REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+        return _redis
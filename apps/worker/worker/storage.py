@@ -0,0 +1,363 @@
+"""Local file storage layout for processed books.
+
+Images, fonts and stylesheets are kept once in a content-addressed blob
+store under ``storage/blobs`` and hard-linked into every book directory
+that uses them. The link count of a blob is its reference count: a blob
+whose only remaining link is the one in the store is no longer used by any
+book and can be collected.
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator, Optional, Tuple
+
+# Root of the shared storage volume (see STORAGE_PATH in .env.example)
+STORAGE_PATH = Path(os.getenv("STORAGE_PATH", "storage"))
+
+BOOKS_DIR = STORAGE_PATH / "books"
+UPLOADS_DIR = STORAGE_PATH / "uploads"
+TEMP_DIR = STORAGE_PATH / "temp"
+BLOBS_DIR = STORAGE_PATH / "blobs"
+
+# Incoming blobs are written here first, on the same filesystem as the store
+BLOBS_TMP_DIR = BLOBS_DIR / "tmp"
+
+# ZIP "crc32-size" keys mapped to the digest of a blob with that content
+BLOB_HINTS_DIR = BLOBS_DIR / "hints"
+
+# Unreferenced blobs younger than this are left alone by garbage collection,
+# so an ingestion that is about to link them does not lose them
+BLOB_GC_GRACE_SECONDS = 60 * 60
+
+# Buffer used when streaming archive members to disk
+COPY_BUFFER_SIZE = 256 * 1024
+
+
+def resolve_storage_path(stored: str) -> Path:
+    """Local path of a path the API recorded relative to STORAGE_PATH.
+
+    Absolute paths, recorded before paths were made relative, are kept.
+    """
+    return STORAGE_PATH / stored
+
+
+def book_dir(book_id: str) -> Path:
+    """Return the storage directory of a processed book."""
+    return BOOKS_DIR / str(book_id)
+
+
+def write_stream(
+    source: BinaryIO,
+    destination: Path,
+    chunk_size: int = COPY_BUFFER_SIZE,
+    on_chunk: Optional[Callable[[bytes], None]] = None,
+) -> int:
+    """Stream a file-like object into its final location.
+
+    Data is written once, to a ``.part`` sibling that is renamed into place
+    when complete, so readers never observe a half-written file.
+
+    Args:
+        source: Readable binary file-like object
+        destination: Final path of the file
+        chunk_size: Size of each read from ``source``
+        on_chunk: Called with every chunk as it is written, so callers can
+            inspect the data without reading it a second time
+
+    Returns:
+        int: Number of bytes written
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial = destination.with_name(destination.name + ".part")
+    written = 0
+
+    try:
+        with open(partial, "wb") as out:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                out.write(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk)
+                written += len(chunk)
+        os.replace(partial, destination)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+
+    return written
+
+
+def blob_path(digest: str) -> Path:
+    """Return the location of a blob in the content-addressed store."""
+    return BLOBS_DIR / digest[:2] / digest[2:4] / digest
+
+
+def _link(blob: Path, destination: Path) -> None:
+    """Atomically point ``destination`` at ``blob``."""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        if os.path.samefile(blob, destination):
+            # rename() between links of one inode is a no-op that would leave
+            # the staging link behind
+            return
+    except FileNotFoundError:
+        pass
+    staging = destination.with_name(destination.name + ".link")
+    staging.unlink(missing_ok=True)
+    os.link(blob, staging)
+    os.replace(staging, destination)
+
+
+def _hash_stream(source: BinaryIO) -> Tuple[str, int]:
+    hasher = hashlib.sha256()
+    size = 0
+    with source:
+        while True:
+            chunk = source.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            size += len(chunk)
+    return hasher.hexdigest(), size
+
+
+def read_hint(hint: str) -> Optional[str]:
+    """Return the blob digest previously recorded for a hint key."""
+    try:
+        return (BLOB_HINTS_DIR / hint).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_hint(hint: str, digest: str) -> None:
+    """Record the blob digest for a hint key."""
+    BLOB_HINTS_DIR.mkdir(parents=True, exist_ok=True)
+    staging = BLOB_HINTS_DIR / f".{hint}.{uuid.uuid4().hex}"
+    staging.write_text(digest)
+    os.replace(staging, BLOB_HINTS_DIR / hint)
+
+
+def _add_blob(staged: Path, digest: str, destination: Path) -> bool:
+    """Link ``destination`` to the blob for ``digest``, adding it if needed.
+
+    ``staged`` holds the content on the store's filesystem and is consumed.
+
+    Returns:
+        bool: Whether the blob already existed
+    """
+    blob = blob_path(digest)
+
+    if blob.exists():
+        try:
+            _link(blob, destination)
+            staged.unlink()
+            return True
+        except FileNotFoundError:
+            pass  # Collected in the meantime; add it again
+
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(staged, blob)
+    _link(blob, destination)
+    return False
+
+
+def store_blob(
+    open_source: Callable[[], BinaryIO],
+    destination: Path,
+    hint: Optional[str] = None,
+) -> Tuple[str, int, bool]:
+    """Store a stream in the blob store and link it to ``destination``.
+
+    When ``hint`` (a cheap key such as a ZIP entry's CRC-32 and size) maps to
+    a blob that is already stored, the source is only hashed to confirm the
+    match and nothing is written at all.
+
+    Args:
+        open_source: Returns a fresh readable stream of the content; called
+            again if a hinted match turns out to be wrong
+        destination: Path in the book directory that should expose the blob
+        hint: Optional lookup key for previously stored content
+
+    Returns:
+        Tuple[str, int, bool]: SHA-256 hex digest, size in bytes, and whether
+        an existing blob was reused
+    """
+    if hint is not None:
+        known = read_hint(hint)
+        if known is not None and blob_path(known).exists():
+            digest, size = _hash_stream(open_source())
+            if digest == known:
+                try:
+                    _link(blob_path(digest), destination)
+                    return digest, size, True
+                except FileNotFoundError:
+                    pass  # Collected in the meantime; store it again below
+
+    BLOBS_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    staged = BLOBS_TMP_DIR / uuid.uuid4().hex
+    hasher = hashlib.sha256()
+
+    with open_source() as source:
+        size = write_stream(source, staged, on_chunk=hasher.update)
+
+    digest = hasher.hexdigest()
+    reused = _add_blob(staged, digest, destination)
+
+    if hint is not None:
+        write_hint(hint, digest)
+
+    return digest, size, reused
+
+
+def link_blob(digest: str, destination: Path) -> Optional[int]:
+    """Link ``destination`` to an existing blob.
+
+    Returns:
+        Optional[int]: Size of the blob, or None if it is not stored
+    """
+    blob = blob_path(digest)
+    try:
+        size = blob.stat().st_size
+        _link(blob, destination)
+    except FileNotFoundError:
+        return None
+    return size
+
+
+def store_file(staged: Path, destination: Path) -> Tuple[str, int]:
+    """Move a file generated on the storage volume into the blob store.
+
+    Args:
+        staged: Finished file; it is consumed
+        destination: Path in the book directory that should expose the blob
+
+    Returns:
+        Tuple[str, int]: SHA-256 hex digest and size in bytes
+    """
+    digest, size = _hash_stream(open(staged, "rb"))
+    _add_blob(staged, digest, destination)
+    return digest, size
+
+
+def intern_file(path: Path) -> Tuple[str, bool]:
+    """Replace a file in a book directory with a link to an identical blob.
+
+    Used for files that are only final after normalization, such as
+    stylesheets. A file with new content becomes a blob itself.
+
+    Returns:
+        Tuple[str, bool]: SHA-256 hex digest and whether an existing blob
+        was reused
+    """
+    digest, _ = _hash_stream(open(path, "rb"))
+
+    BLOBS_TMP_DIR.mkdir(parents=True, exist_ok=True)
+    staged = BLOBS_TMP_DIR / uuid.uuid4().hex
+    os.link(path, staged)
+
+    return digest, _add_blob(staged, digest, path)
+
+
+def release_blobs(digests: Iterable[str]) -> int:
+    """Remove blobs that are no longer linked from any book directory.
+
+    Blobs added within the last ``BLOB_GC_GRACE_SECONDS`` are kept, since an
+    ingestion may be about to link them.
+
+    Returns:
+        int: Bytes reclaimed
+    """
+    reclaimed = 0
+    cutoff = time.time() - BLOB_GC_GRACE_SECONDS
+
+    for digest in set(digests):
+        blob = blob_path(digest)
+        try:
+            stat = blob.stat()
+        except FileNotFoundError:
+            continue
+        if stat.st_nlink == 1 and stat.st_mtime < cutoff:
+            blob.unlink(missing_ok=True)
+            reclaimed += stat.st_size
+
+    return reclaimed
+
+
+def _manifest_digests(node) -> Iterator[str]:
+    """Yield every ``sha256`` recorded anywhere in a manifest."""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "sha256" and isinstance(value, str):
+                yield value
+            else:
+                yield from _manifest_digests(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _manifest_digests(value)
+
+
+def remove_tree(path: Path) -> int:
+    """Delete a directory tree, walking it with ``os.scandir``.
+
+    Only the tree's own directories are held in memory, never a listing of
+    its files.
+
+    Returns:
+        int: Bytes reclaimed; files with other hard links (blobs) free
+        nothing and are not counted
+    """
+    reclaimed = 0
+    # Directories are removed once all of their children are
+    stack = [(str(path), False)]
+
+    while stack:
+        directory, visited = stack.pop()
+        if visited:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                pass
+            continue
+
+        stack.append((directory, True))
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append((entry.path, False))
+                        continue
+                    try:
+                        stat = entry.stat(follow_symlinks=False)
+                        os.unlink(entry.path)
+                    except FileNotFoundError:
+                        continue
+                    if stat.st_nlink == 1:
+                        reclaimed += stat.st_size
+        except FileNotFoundError:
+            continue
+
+    return reclaimed
+
+
+def delete_book(book_id: str) -> int:
+    """Delete a book directory and every blob only that book referenced.
+
+    Returns:
+        int: Bytes reclaimed from the book directory and the blob store
+    """
+    directory = book_dir(book_id)
+
+    try:
+        with open(directory / "manifest.json") as f:
+            digests = list(_manifest_digests(json.load(f)))
+    except (FileNotFoundError, ValueError):
+        digests = []
+
+    reclaimed = remove_tree(directory)
+    return reclaimed + release_blobs(digests)
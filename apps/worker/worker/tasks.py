@@ -1,117 +1,249 @@
 """Background tasks for EPUB processing."""
 
+import logging
 import os
-import shutil
-import tempfile
-from pathlib import Path
-from zipfile import ZipFile
+import time
+from typing import Optional
 
 from celery import current_app as celery_app
+from celery.exceptions import SoftTimeLimitExceeded
 
+from . import db, exporter, metrics
+from .epub.archive import EpubError
+from .ingestion import ingest_epub
+from .janitor import run_janitor
+from .progress import ProgressReporter, publish_progress
+from .reading_progress import flush_reading_progress
+from .storage import STORAGE_PATH, book_dir, delete_book, resolve_storage_path
 
-@celery_app.task(name="process_epub")
-def process_epub_task(epub_path: str, book_id: str, user_id: str) -> dict:
+logger = logging.getLogger(__name__)
+
+# Expired refresh token purge: rows per transaction and batches per run
+TOKEN_PURGE_BATCH_SIZE = int(os.getenv("TOKEN_PURGE_BATCH_SIZE", "5000"))
+TOKEN_PURGE_MAX_BATCHES = int(os.getenv("TOKEN_PURGE_MAX_BATCHES", "200"))
+
+# Storage janitor: entries visited per run, ids per query and lock expiry
+JANITOR_MAX_ENTRIES = int(os.getenv("JANITOR_MAX_ENTRIES", "5000"))
+JANITOR_BATCH_SIZE = int(os.getenv("JANITOR_BATCH_SIZE", "500"))
+JANITOR_LOCK_SECONDS = int(os.getenv("JANITOR_LOCK_SECONDS", "600"))
+
+# Reading progress flush: positions per statement and lock expiry in seconds
+READING_PROGRESS_BATCH_SIZE = int(os.getenv("READING_PROGRESS_BATCH_SIZE", "1000"))
+READING_PROGRESS_FLUSH_LOCK_SECONDS = int(os.getenv("READING_PROGRESS_FLUSH_LOCK_SECONDS", "60"))
+
+
+@celery_app.task(name="process_epub", bind=True, acks_late=True)
+def process_epub_task(self, epub_path: str, book_id: str, user_id: str) -> dict:
     """Process uploaded EPUB file into structured assets.
     
+    Acknowledged only once finished, so a book whose worker dies is
+    redelivered instead of lost. Queue wait, run time and time to readable
+    are recorded per queue (see ``worker.metrics``).
+    
     Args:
-        epub_path: Path to uploaded EPUB file
+        epub_path: Path of the uploaded EPUB file, relative to STORAGE_PATH
         book_id: UUID of the book record
         user_id: UUID of the user
         
     Returns:
         dict: Processing result with status and metadata
     """
+    queue = (self.request.delivery_info or {}).get("routing_key") or "celery"
+    enqueued_at = self.request.get("enqueued_at")
+    started_at = time.time()
+    
+    # Celery only enforces time limits on the prefork pool. Elsewhere the
+    # soft limit is checked between ingestion steps, and the hard limit
+    # bounds the waits on pooled normalize and image work, so a hung
+    # document or image cannot hold the worker slot
+    time_limit, soft_time_limit = self.request.timelimit or (None, None)
+    now = time.monotonic()
+    deadline = now + soft_time_limit if soft_time_limit else None
+    hard_deadline = now + time_limit if time_limit else None
+    
+    result = _process_epub(epub_path, book_id, deadline, hard_deadline)
+    
+    finished_at = time.time()
+    observed = {"run_seconds": finished_at - started_at}
+    if enqueued_at is not None:
+        observed["queue_wait_seconds"] = max(started_at - enqueued_at, 0.0)
+        if result["status"] == "success":
+            observed["time_to_readable_seconds"] = max(finished_at - enqueued_at, 0.0)
+    metrics.observe(queue, observed)
+    
+    return result
+
+
+def _process_epub(
+    epub_path: str,
+    book_id: str,
+    deadline: Optional[float],
+    hard_deadline: Optional[float],
+) -> dict:
     try:
-        epub_file = Path(epub_path)
+        epub_file = resolve_storage_path(epub_path)
         if not epub_file.exists():
+            publish_progress(book_id, "failed", message="EPUB file not found")
             return {"status": "error", "message": f"EPUB file not found: {epub_path}"}
         
-        # Create book storage directory
-        book_storage = Path(f"storage/books/{book_id}")
-        book_storage.mkdir(parents=True, exist_ok=True)
+        publish_progress(book_id, "started")
+        
+        # Members are streamed straight from the archive into book storage
+        result = ingest_epub(
+            epub_file,
+            book_id,
+            progress=ProgressReporter(book_id, deadline),
+            deadline=hard_deadline,
+        )
+        manifest = result.manifest
         
-        # Extract EPUB to temp directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            
-            # Extract ZIP contents
-            with ZipFile(epub_file, 'r') as zip_ref:
-                zip_ref.extractall(temp_path)
-            
-            # Find OPF file (package document)
-            container_xml = temp_path / "META-INF" / "container.xml"
-            if not container_xml.exists():
-                return {"status": "error", "message": "Invalid EPUB: missing container.xml"}
-            
-            # TODO: Parse container.xml to find OPF file path
-            # TODO: Parse OPF file to extract manifest, spine, metadata
-            # TODO: Copy chapter files to structured directories
-            # TODO: Copy images, fonts, stylesheets
-            # TODO: Generate manifest.json for reader
-            
-            # Placeholder: copy all files for now
-            chapters_dir = book_storage / "chapters"
-            images_dir = book_storage / "images"
-            fonts_dir = book_storage / "fonts"
-            
-            chapters_dir.mkdir(exist_ok=True)
-            images_dir.mkdir(exist_ok=True)
-            fonts_dir.mkdir(exist_ok=True)
-            
-            # Create basic manifest
-            manifest = {
-                "book_id": book_id,
-                "title": "Processed EPUB",
-                "author": "Unknown",
-                "chapters": [],
-                "images": [],
-                "fonts": [],
-                "processing_status": "completed"
-            }
-            
-            # Write manifest
-            import json
-            with open(book_storage / "manifest.json", "w") as f:
-                json.dump(manifest, f, indent=2)
+        thumbnail = manifest["thumbnail"]
+        metadata = {
+            "title": manifest["title"],
+            "author": manifest["author"],
+            "description": manifest["description"],
+            "isbn": manifest["isbn"],
+            "language": manifest["language"],
+            "cover_image_path": (
+                str((book_dir(book_id) / thumbnail["path"]).relative_to(STORAGE_PATH))
+                if thumbnail else None
+            ),
+        }
+        # Keep whatever the upload recorded for fields the EPUB leaves out
+        db.run(db.update_book(
+            book_id,
+            processed=True,
+            **{name: value for name, value in metadata.items() if value},
+        ))
+        
+        # A search indexing failure leaves the book readable, just unsearchable
+        try:
+            db.run(db.index_book_text(book_id, result.chapter_texts))
+        except Exception:
+            logger.exception("Could not index book %s for search", book_id)
+        
+        exporter.observe_ingestion(result.timings, epub_file.stat().st_size)
         
         # Remove original upload file
         epub_file.unlink()
         
+        publish_progress(book_id, "done", chapters=len(manifest["chapters"]), timings=result.timings)
+        
         return {
             "status": "success", 
             "book_id": book_id,
-            "manifest_path": str(book_storage / "manifest.json")
+            "manifest_path": str(book_dir(book_id) / "manifest.json"),
+            "chapters": len(manifest["chapters"]),
+            "normalize_workers": result.normalize_workers,
+            "deduplicated_assets": result.deduplicated,
+            "timings": result.timings,
         }
         
+    except EpubError as e:
+        publish_progress(book_id, "failed", message=str(e))
+        return {"status": "error", "message": str(e)}
+    except (SoftTimeLimitExceeded, TimeoutError):
+        publish_progress(book_id, "failed", message="Processing timed out")
+        return {"status": "error", "message": "Processing timed out"}
     except Exception as e:
+        publish_progress(book_id, "failed", message="Processing failed")
         return {"status": "error", "message": f"Processing failed: {str(e)}"}
 
 
+@celery_app.task(name="delete_book")
+def delete_book_task(book_id: str) -> dict:
+    """Delete a book's processed assets.
+    
+    Shared blobs are only removed once no other book links to them.
+    
+    Args:
+        book_id: UUID of the deleted book record
+        
+    Returns:
+        dict: Deletion result with the bytes reclaimed
+    """
+    try:
+        reclaimed = delete_book(book_id)
+        return {"status": "success", "book_id": book_id, "reclaimed_bytes": reclaimed}
+        
+    except Exception as e:
+        return {"status": "error", "message": f"Deletion failed: {str(e)}"}
+
+
+@celery_app.task(name="storage_janitor")
+def storage_janitor_task() -> dict:
+    """Reclaim orphaned book directories, uploads, temp files and blobs.
+    
+    Runs periodically from Celery beat. Each run continues the janitor's
+    cycle over storage for JANITOR_MAX_ENTRIES entries (see
+    ``worker.janitor``), so a run stays short however much is stored.
+    
+    Returns:
+        dict: Janitor result with entries scanned, removals and bytes reclaimed
+    """
+    try:
+        stats = run_janitor(JANITOR_MAX_ENTRIES, JANITOR_BATCH_SIZE, JANITOR_LOCK_SECONDS)
+        if stats["reclaimed_bytes"]:
+            logger.info(
+                "Storage janitor reclaimed %d bytes (%d books, %d uploads, %d temp files, %d blobs)",
+                stats["reclaimed_bytes"], stats["books_removed"], stats["uploads_removed"],
+                stats["temp_files_removed"], stats["blobs_removed"],
+            )
+        return {"status": "success", **stats}
+        
+    except Exception as e:
+        return {"status": "error", "message": f"Storage janitor failed: {str(e)}"}
+
+
 @celery_app.task(name="cleanup_temp_files")
 def cleanup_temp_files_task() -> dict:
     """Clean up old temporary files.
     
+    Kept for existing schedules; temporary files are now removed by the
+    storage janitor.
+    
     Returns:
         dict: Cleanup result
     """
+    return storage_janitor_task()
+
+
+@celery_app.task(name="purge_expired_tokens")
+def purge_expired_tokens_task() -> dict:
+    """Delete expired refresh tokens in bounded batches.
+    
+    Runs periodically from Celery beat. A run stops after
+    TOKEN_PURGE_MAX_BATCHES batches; any backlog is picked up by the next run.
+    
+    Returns:
+        dict: Purge result with rows deleted, rows/sec and lock times
+    """
     try:
-        temp_dir = Path("storage/temp")
-        if not temp_dir.exists():
-            return {"status": "success", "message": "No temp directory to clean"}
-        
-        # Remove files older than 24 hours
-        import time
-        current_time = time.time()
-        cleaned_count = 0
+        stats = db.run(db.purge_expired_refresh_tokens(TOKEN_PURGE_BATCH_SIZE, TOKEN_PURGE_MAX_BATCHES))
+        logger.info(
+            "Purged %d expired refresh tokens in %d batches (%.0f rows/s, max lock %.3fs)",
+            stats["deleted"], stats["batches"], stats["rows_per_second"], stats["max_lock_seconds"],
+        )
+        return {"status": "success", **stats}
         
-        for item in temp_dir.rglob("*"):
-            if item.is_file():
-                file_age = current_time - item.stat().st_mtime
-                if file_age > (24 * 60 * 60):  # 24 hours in seconds
-                    item.unlink()
-                    cleaned_count += 1
-        
-        return {"status": "success", "cleaned_files": cleaned_count}
+    except Exception as e:
+        return {"status": "error", "message": f"Token purge failed: {str(e)}"}
+
+
+@celery_app.task(name="flush_reading_progress")
+def flush_reading_progress_task() -> dict:
+    """Write buffered reading positions to the database.
+    
+    Runs periodically from Celery beat. Each batch of positions is a single
+    INSERT ... ON CONFLICT, so writes scale with the number of distinct
+    books read since the last flush, not with progress requests.
+    
+    Returns:
+        dict: Flush result with positions flushed, rows written and batches
+    """
+    try:
+        stats = flush_reading_progress(READING_PROGRESS_BATCH_SIZE, READING_PROGRESS_FLUSH_LOCK_SECONDS)
+        return {"status": "success", **stats}
         
     except Exception as e:
-        return {"status": "error", "message": f"Cleanup failed: {str(e)}"}
+        return {"status": "error", "message": f"Reading progress flush failed: {str(e)}"}
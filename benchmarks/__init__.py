@@ -0,0 +1,17 @@
+"""Reproducible benchmarks for Pixel Pages.
+
+Run from the repository root:
+
+    python -m benchmarks epubs                 # generate the synthetic EPUBs
+    python -m benchmarks auth --output auth.json
+    python -m benchmarks ingestion --output ingestion.json
+    python -m benchmarks tokens --output tokens.json
+    python -m benchmarks compare before.json after.json
+
+``auth`` drives a running API (``docker compose up``) over HTTP; ``ingestion``
+runs the worker's ingestion pipeline in fresh subprocesses against
+throwaway storage, so it needs the worker's requirements but no services;
+``tokens`` likewise needs only the API's requirements.
+Every result file carries the environment it was measured in (commit,
+Python, CPU count and parameters), so runs can be compared.
+"""
@@ -0,0 +1,106 @@
+"""Command line entry point, see the package docstring."""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import Iterator, Tuple
+
+from .epubs import SPECS, describe, get_epub
+from .stats import environment
+
+
+def _write(name: str, params: dict, results: dict, output: str) -> None:
+    report = json.dumps({"benchmark": name, "environment": environment(), "params": params, "results": results}, indent=2)
+    if output == "-":
+        print(report)
+    else:
+        Path(output).write_text(report + "\n")
+        print(f"Wrote {output}", file=sys.stderr)
+
+
+def _numbers(node, path: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(node, dict):
+        for key, value in node.items():
+            yield from _numbers(value, f"{path}.{key}" if path else key)
+    elif isinstance(node, (int, float)) and not isinstance(node, bool):
+        yield path, node
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """Print every measurement present in both result files with its change."""
+    before = dict(_numbers(json.loads(Path(before_path).read_text())["results"]))
+    after = dict(_numbers(json.loads(Path(after_path).read_text())["results"]))
+
+    width = max((len(key) for key in before if key in after), default=0)
+    for key, old in before.items():
+        if key not in after:
+            continue
+        new = after[key]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{key:<{width}}  {old:>14,.3f}  {new:>14,.3f}  {change:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Pixel Pages benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    epubs = commands.add_parser("epubs", help="generate the synthetic EPUBs")
+    epubs.add_argument("--seed", type=int, default=0)
+
+    auth = commands.add_parser("auth", help="load test the auth routes of a running API")
+    auth.add_argument("--base-url", default="http://localhost:8000")
+    auth.add_argument("--routes", nargs="+", choices=["login", "me", "refresh"], default=["login", "me", "refresh"])
+    auth.add_argument("--requests", type=int, default=500, help="requests per route")
+    auth.add_argument("--concurrency", type=int, default=16)
+    auth.add_argument("--warmup", type=int, default=50, help="unmeasured requests per route")
+    auth.add_argument("--output", default="-", help="result file, - for stdout")
+
+    ingestion = commands.add_parser("ingestion", help="ingest synthetic EPUBs with the worker pipeline")
+    ingestion.add_argument("--books", nargs="+", choices=sorted(SPECS), default=list(SPECS))
+    ingestion.add_argument("--repeat", type=int, default=3)
+    ingestion.add_argument("--seed", type=int, default=0)
+    ingestion.add_argument("--output", default="-", help="result file, - for stdout")
+
+    tokens = commands.add_parser("tokens", help="time access token verification with and without the cache")
+    tokens.add_argument("--clients", type=int, default=1000, help="distinct tokens, one per reader")
+    tokens.add_argument("--requests", type=int, default=200_000)
+    tokens.add_argument("--output", default="-", help="result file, - for stdout")
+
+    diff = commands.add_parser("compare", help="compare two result files")
+    diff.add_argument("before")
+    diff.add_argument("after")
+
+    args = parser.parse_args()
+
+    if args.command == "epubs":
+        for spec in SPECS.values():
+            path = get_epub(spec, args.seed)
+            print(f"{path}  {describe(spec, path)['bytes']:,} bytes")
+
+    elif args.command == "auth":
+        from .auth import run_auth
+
+        params = {key: getattr(args, key) for key in ("base_url", "routes", "requests", "concurrency", "warmup")}
+        results = asyncio.run(run_auth(args.base_url, args.routes, args.requests, args.concurrency, args.warmup))
+        _write("auth", params, results, args.output)
+
+    elif args.command == "ingestion":
+        from .ingestion import run_ingestion
+
+        params = {"books": args.books, "repeat": args.repeat, "seed": args.seed}
+        _write("ingestion", params, run_ingestion(args.books, args.repeat, args.seed), args.output)
+
+    elif args.command == "tokens":
+        from .tokens import run_tokens
+
+        params = {"clients": args.clients, "requests": args.requests}
+        _write("tokens", params, run_tokens(args.clients, args.requests), args.output)
+
+    else:
+        compare(args.before, args.after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Load benchmark of the API's authentication routes.
+
+Registers a throwaway user on a running API, then sends a fixed number of
+requests to each route from ``concurrency`` concurrent clients:
+
+* ``login``: ``POST /auth/login`` (bcrypt verification and a refresh token row)
+* ``me``: ``GET /auth/me`` (access token verification and the user lookup)
+* ``refresh``: ``POST /auth/refresh`` (refresh token verification)
+
+Responses other than 200 are counted as errors by status code; a 503 from
+the password hasher's queue limit shows up there rather than as latency.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+
+from .stats import summarize_ms
+
+PASSWORD = "benchmark-password"
+
+ROUTES = ("login", "me", "refresh")
+
+
+async def _register(client: httpx.AsyncClient) -> Dict[str, str]:
+    email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+    response = await client.post("/auth/register", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+
+    response = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return {
+        "email": email,
+        "access_token": response.json()["access_token"],
+        # The cookie is Secure, so httpx would not send it back over HTTP
+        "refresh_token": response.cookies["refresh_token"],
+    }
+
+
+def _requests(user: Dict[str, str]) -> Dict[str, Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]]:
+    credentials = {"email": user["email"], "password": PASSWORD}
+    bearer = {"Authorization": f"Bearer {user['access_token']}"}
+    cookie = {"Cookie": f"refresh_token={user['refresh_token']}"}
+    return {
+        "login": lambda client: client.post("/auth/login", json=credentials),
+        "me": lambda client: client.get("/auth/me", headers=bearer),
+        "refresh": lambda client: client.post("/auth/refresh", headers=cookie),
+    }
+
+
+async def _load(client: httpx.AsyncClient, send, requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await send(client)
+                status = response.status_code
+            except httpx.HTTPError as exc:
+                status = type(exc).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1) if elapsed else 0.0,
+        "errors": {str(status): count for status, count in statuses.items() if status != 200},
+        "latency_ms": summarize_ms(latencies),
+    }
+
+
+async def run_auth(base_url: str, routes: List[str], requests: int, concurrency: int, warmup: int) -> dict:
+    """Benchmark the given auth routes of the API at ``base_url``."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        user = await _register(client)
+        senders = _requests(user)
+
+        results = {}
+        for route in routes:
+            if warmup:
+                await _load(client, senders[route], warmup, concurrency)
+            results[route] = await _load(client, senders[route], requests, concurrency)
+        return results
@@ -0,0 +1,135 @@
+"""Synthetic EPUBs of varying size and chapter count.
+
+Books are generated from a fixed seed, so every run of a benchmark reads
+byte-identical input. Images are noise PNGs, which do not compress, so a
+book's size is dominated by them exactly like in image-heavy EPUBs.
+"""
+
+import random
+import struct
+import zipfile
+import zlib
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List
+
+from .stats import REPO_ROOT
+
+CACHE_DIR = REPO_ROOT / "benchmarks" / ".epubs"
+
+WORDS = (
+    "the lighthouse keeper walked along a narrow shore while grey waves broke "
+    "against old stones and gulls circled above the harbour town where lamps "
+    "burned late into every winter night and letters arrived by boat"
+).split()
+
+
+@dataclass(frozen=True)
+class EpubSpec:
+    name: str
+    chapters: int
+    paragraphs: int  # Per chapter
+    images: int
+    image_width: int
+    image_height: int
+
+
+SPECS: Dict[str, EpubSpec] = {
+    spec.name: spec for spec in (
+        EpubSpec("short-story", chapters=3, paragraphs=30, images=0, image_width=0, image_height=0),
+        EpubSpec("novel", chapters=40, paragraphs=80, images=2, image_width=600, image_height=900),
+        EpubSpec("long-novel", chapters=150, paragraphs=100, images=4, image_width=600, image_height=900),
+        EpubSpec("comic", chapters=30, paragraphs=1, images=30, image_width=640, image_height=800),
+    )
+}
+
+
+def _png(width: int, height: int, rng: random.Random) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    row = width * 3
+    raw = b"".join(b"\x00" + rng.randbytes(row) for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 1)) + chunk(b"IEND", b"")
+
+
+def _add(epub: zipfile.ZipFile, name: str, data, compress_type: int = zipfile.ZIP_DEFLATED) -> None:
+    # A fixed timestamp keeps the archive byte-identical between runs
+    info = zipfile.ZipInfo(name, date_time=(2020, 1, 1, 0, 0, 0))
+    info.compress_type = compress_type
+    epub.writestr(info, data)
+
+
+def _paragraph(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(40, 120))]
+    return "<p>" + " ".join(words).capitalize() + ".</p>"
+
+
+def write_epub(spec: EpubSpec, path: Path, seed: int = 0) -> Path:
+    """Write the EPUB described by ``spec``."""
+    rng = random.Random(f"{spec.name}:{seed}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = path.with_name(path.name + ".part")
+
+    items: List[str] = ['<item id="css" href="Styles/book.css" media-type="text/css"/>']
+    spine: List[str] = []
+
+    with zipfile.ZipFile(staging, "w", zipfile.ZIP_DEFLATED) as epub:
+        _add(epub, "mimetype", "application/epub+zip", zipfile.ZIP_STORED)
+        _add(
+            epub,
+            "META-INF/container.xml",
+            '<?xml version="1.0"?><container version="1.0" '
+            'xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+            '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            "</rootfiles></container>",
+        )
+        _add(epub, "OEBPS/Styles/book.css", "body { margin: 0 5%; }\np { text-indent: 1em; }\n")
+
+        for index in range(spec.images):
+            name = f"image{index}.png"
+            items.append(f'<item id="img{index}" href="Images/{name}" media-type="image/png"/>')
+            _add(epub, f"OEBPS/Images/{name}", _png(spec.image_width, spec.image_height, rng), zipfile.ZIP_STORED)
+
+        for index in range(spec.chapters):
+            body = "".join(_paragraph(rng) for _ in range(spec.paragraphs))
+            if spec.images:
+                body += f'<img src="../Images/image{index % spec.images}.png" alt=""/>'
+            items.append(f'<item id="c{index}" href="Text/c{index}.xhtml" media-type="application/xhtml+xml"/>')
+            spine.append(f'<itemref idref="c{index}"/>')
+            _add(
+                epub,
+                f"OEBPS/Text/c{index}.xhtml",
+                '<?xml version="1.0"?><html xmlns="http://www.w3.org/1999/xhtml"><head>'
+                f'<title>Chapter {index + 1}</title><link rel="stylesheet" href="../Styles/book.css"/>'
+                f"</head><body><h1>Chapter {index + 1}</h1>{body}</body></html>",
+            )
+
+        if spec.images:
+            items.append('<item id="cover" href="Images/image0.png" media-type="image/png" properties="cover-image"/>')
+        _add(
+            epub,
+            "OEBPS/content.opf",
+            '<?xml version="1.0"?><package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f"<dc:title>Benchmark {spec.name}</dc:title><dc:creator>Pixel Pages</dc:creator>"
+            f"<dc:language>en</dc:language><dc:identifier>urn:uuid:benchmark-{spec.name}-{seed}</dc:identifier>"
+            f"</metadata><manifest>{''.join(items)}</manifest><spine>{''.join(spine)}</spine></package>",
+        )
+
+    staging.replace(path)
+    return path
+
+
+def get_epub(spec: EpubSpec, seed: int = 0, cache_dir: Path = CACHE_DIR) -> Path:
+    """Path of the EPUB for ``spec``, generated on first use."""
+    # Keyed by the parameters too, so editing a spec regenerates its book
+    path = cache_dir / f"{spec.name}-{seed}-{zlib.crc32(repr(spec).encode()):08x}.epub"
+    if not path.exists():
+        write_epub(spec, path, seed)
+    return path
+
+
+def describe(spec: EpubSpec, path: Path) -> dict:
+    return {**asdict(spec), "bytes": path.stat().st_size}
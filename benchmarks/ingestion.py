@@ -0,0 +1,119 @@
+"""Benchmark of the worker's ingestion pipeline.
+
+Each run ingests one synthetic EPUB with ``worker.ingestion.ingest_epub`` in
+a fresh interpreter with its own empty storage directory, so peak RSS and
+storage writes belong to that book alone and caches start cold. Reported
+per run:
+
+* the pipeline's own stage timings (parse, extract, normalize, images)
+* peak RSS of the process and of its children (the normalize pool)
+* bytes stored (distinct inodes under storage) and bytes passed to write
+  calls by the process, where ``/proc/self/io`` is available
+
+Database and Redis calls of ``process_epub`` are not part of the run.
+"""
+
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from .epubs import SPECS, describe, get_epub
+from .stats import REPO_ROOT
+
+WORKER_DIR = REPO_ROOT / "apps" / "worker"
+
+
+def _stored_bytes(root: Path) -> int:
+    seen = set()
+    total = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            stat = os.stat(os.path.join(directory, name))
+            if (stat.st_dev, stat.st_ino) not in seen:
+                seen.add((stat.st_dev, stat.st_ino))
+                total += stat.st_size
+    return total
+
+
+def _write_bytes() -> int:
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return -1
+
+
+def _child(epub_path: str) -> None:
+    """Ingest one book and print the measurements as JSON."""
+    from worker.ingestion import ingest_epub
+
+    writes_before = _write_bytes()
+    started = time.perf_counter()
+    result = ingest_epub(Path(epub_path), "00000000-0000-0000-0000-000000000000")
+    elapsed = time.perf_counter() - started
+    writes = _write_bytes()
+
+    print(json.dumps({
+        "seconds": elapsed,
+        "stages": result.timings,
+        "chapters": len(result.manifest["chapters"]),
+        "normalize_workers": result.normalize_workers,
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "children_peak_rss_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        "write_call_bytes": writes - writes_before if writes >= 0 else None,
+        "stored_bytes": _stored_bytes(Path(os.environ["STORAGE_PATH"])),
+    }))
+
+
+def _run_once(epub: Path) -> dict:
+    with tempfile.TemporaryDirectory(prefix="pixel-pages-bench-") as storage:
+        env = {
+            **os.environ,
+            "STORAGE_PATH": storage,
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(WORKER_DIR), os.environ.get("PYTHONPATH")])),
+        }
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.ingestion", str(epub)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _median_run(runs: List[dict]) -> dict:
+    """Median of every measurement over the runs."""
+    def median(values):
+        values = [value for value in values if value is not None]
+        if not values:
+            return None
+        middle = statistics.median(values)
+        return round(middle) if all(isinstance(value, int) for value in values) else middle
+
+    stages = {stage: median([run["stages"].get(stage) for run in runs]) for stage in runs[0]["stages"]}
+    summary = {key: median([run[key] for run in runs]) for key in runs[0] if key != "stages"}
+    summary["stages_ms"] = {stage: round(value * 1000, 2) for stage, value in stages.items()}
+    summary["seconds"] = round(summary["seconds"], 4)
+    return summary
+
+
+def run_ingestion(books: List[str], repeat: int, seed: int = 0) -> Dict[str, dict]:
+    """Ingest each named synthetic book ``repeat`` times; medians per book."""
+    results = {}
+    for name in books:
+        spec = SPECS[name]
+        epub = get_epub(spec, seed)
+        runs = [_run_once(epub) for _ in range(repeat)]
+        results[name] = {"book": describe(spec, epub), "runs": repeat, **_median_run(runs)}
+    return results
+
+
+if __name__ == "__main__":
+    _child(sys.argv[1])
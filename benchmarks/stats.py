@@ -0,0 +1,56 @@
+"""Summaries of latency samples."""
+
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (``q`` in 0-100) of unsorted samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize_ms(samples: List[float]) -> Dict[str, float]:
+    """Count, mean and percentiles of samples in seconds, as milliseconds."""
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples) * 1000, 3),
+        "p50": round(percentile(samples, 50) * 1000, 3),
+        "p90": round(percentile(samples, 90) * 1000, 3),
+        "p99": round(percentile(samples, 99) * 1000, 3),
+        "max": round(max(samples) * 1000, 3),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment() -> dict:
+    """Where a benchmark ran, recorded with its results."""
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
@@ -0,0 +1,87 @@
+"""Benchmark of access token verification under ``/auth/me``-like load.
+
+Simulates ``clients`` readers that each send their own access token over and
+over, interleaved, and times ``api.auth.verify_token`` for every request:
+once with the verified-token cache disabled (``TOKEN_CACHE_MAX_SIZE=0``, a
+full decode and signature check per request) and once with the default
+cache. Each mode runs in a fresh interpreter, so neither sees the other's
+cache. Only the API's requirements are needed, no services.
+
+The end to end effect on the route itself is measured by running the
+``auth`` benchmark against an API started with each setting.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from .stats import REPO_ROOT, percentile
+
+API_DIR = REPO_ROOT / "apps" / "api"
+
+MODES = {"uncached": "0", "cached": None}
+
+
+def _summarize_us(samples: List[float]) -> Dict[str, float]:
+    return {
+        "mean": round(sum(samples) / len(samples) * 1e6, 2),
+        "p50": round(percentile(samples, 50) * 1e6, 2),
+        "p99": round(percentile(samples, 99) * 1e6, 2),
+    }
+
+
+def _child(clients: int, requests: int) -> None:
+    """Verify tokens of ``clients`` users ``requests`` times; print JSON."""
+    from api.auth import create_access_token, verify_token
+
+    tokens = [create_access_token({"sub": f"00000000-0000-0000-0000-{i:012d}"}) for i in range(clients)]
+    # The first request of every client, a cache miss in both modes
+    for token in tokens:
+        verify_token(token)
+
+    latencies = []
+    started = time.perf_counter()
+    for i in range(requests):
+        token = tokens[i % clients]
+        before = time.perf_counter()
+        if verify_token(token) is None:
+            raise RuntimeError("token rejected")
+        latencies.append(time.perf_counter() - before)
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "verifications_per_second": round(requests / elapsed),
+        "latency_us": _summarize_us(latencies),
+    }))
+
+
+def _run_mode(cache_size, clients: int, requests: int) -> dict:
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(API_DIR), os.environ.get("PYTHONPATH")])),
+    }
+    env.pop("TOKEN_CACHE_MAX_SIZE", None)
+    if cache_size is not None:
+        env["TOKEN_CACHE_MAX_SIZE"] = cache_size
+
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.tokens", str(clients), str(requests)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_tokens(clients: int, requests: int) -> Dict[str, dict]:
+    """Token verification with the cache disabled and enabled."""
+    results = {mode: _run_mode(cache_size, clients, requests) for mode, cache_size in MODES.items()}
+    results["speedup"] = round(
+        results["cached"]["verifications_per_second"] / results["uncached"]["verifications_per_second"], 1
+    )
+    return results
+
+
+if __name__ == "__main__":
+    _child(int(sys.argv[1]), int(sys.argv[2]))